@@ -1,5 +1,5 @@
 from django.contrib import admin
-from affiliation.models import Citizen, Affiliation
+from affiliation.models import Citizen, Affiliation, OutboxEvent
 
 
 @admin.register(Citizen)
@@ -31,3 +31,27 @@ class AffiliationAdmin(admin.ModelAdmin):
         ),
         ("Additional Information", {"fields": ("notes",), "classes": ("collapse",)}),
     )
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = (
+        "event_type",
+        "created_at",
+        "claimed_at",
+        "published_at",
+        "attempts",
+        "next_attempt_at",
+        "failed_at",
+    )
+    list_filter = ("event_type", "published_at", "failed_at")
+    readonly_fields = (
+        "event_type",
+        "payload",
+        "created_at",
+        "claimed_at",
+        "published_at",
+        "attempts",
+        "next_attempt_at",
+        "failed_at",
+    )
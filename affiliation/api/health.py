@@ -6,9 +6,25 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.db import connection
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Cache the database check briefly so tight probe intervals don't hit the DB each time
+DATABASE_CHECK_TTL = 2.0
+_database_checked_at = 0.0
+
+
+def _database_is_healthy():
+    """Ensure the database connection, at most once every DATABASE_CHECK_TTL seconds."""
+    global _database_checked_at
+
+    if time.monotonic() - _database_checked_at < DATABASE_CHECK_TTL:
+        return True
+    connection.ensure_connection()
+    _database_checked_at = time.monotonic()
+    return True
+
 
 @api_view(["GET"])
 @permission_classes([AllowAny])
@@ -24,7 +40,7 @@ def health_check(request):
 
     # Check database connection
     try:
-        connection.ensure_connection()
+        _database_is_healthy()
         health_status["checks"]["database"] = "ok"
     except Exception as e:
         logger.error(f"Database health check failed: {str(e)}")
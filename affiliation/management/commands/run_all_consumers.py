@@ -3,7 +3,8 @@ Django management command to run all RabbitMQ consumers in parallel threads.
 
 This command starts all consumers (documents_ready, register_citizen_completed,
 unregister_citizen_completed) in separate threads so they can all listen
-simultaneously from a single service.
+simultaneously from a single service. The outbox relay runs in its own thread
+alongside them, publishing events recorded by the services.
 
 Usage:
     python manage.py run_all_consumers
@@ -29,6 +30,7 @@ class Command(BaseCommand):
         from affiliation.rabbitmq.documents_ready_consumer import main as documents_ready_main
         from affiliation.rabbitmq.register_citizen_consumer import main as register_citizen_main
         from affiliation.rabbitmq.unregister_citizen_consumer import main as unregister_citizen_main
+        from affiliation.rabbitmq.outbox import run_relay
 
         # Create threads for each consumer
         consumers = [
@@ -62,8 +64,16 @@ class Command(BaseCommand):
             thread.start()
             threads.append(thread)
 
+        # The relay publishes to many queues, so it isn't listed as a consumer
+        self.stdout.write(self.style.SUCCESS("✓ Starting OutboxRelay (publishes pending events)"))
+        thread = threading.Thread(target=run_relay, name="OutboxRelay", daemon=True)
+        thread.start()
+        threads.append(thread)
+
         self.stdout.write(self.style.SUCCESS("\n" + "=" * 70))
-        self.stdout.write(self.style.SUCCESS(f"All {len(threads)} consumers started successfully!"))
+        self.stdout.write(
+            self.style.SUCCESS(f"All {len(consumers)} consumers and the outbox relay started!")
+        )
         self.stdout.write(self.style.SUCCESS("Press Ctrl+C to stop all consumers"))
         self.stdout.write(self.style.SUCCESS("=" * 70 + "\n"))
 
@@ -0,0 +1,26 @@
+"""
+Django management command to run the outbox relay.
+
+This command publishes events stored in the outbox table to RabbitMQ.
+
+Usage:
+    python manage.py run_outbox_relay
+    python manage.py run_outbox_relay --batch-size 500 --interval 0.5
+"""
+
+from django.core.management.base import BaseCommand
+from affiliation.rabbitmq.outbox import run_relay
+
+
+class Command(BaseCommand):
+    help = "Publish pending outbox events to RabbitMQ"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=100, help="Events published per batch"
+        )
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to wait when idle")
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS("Starting outbox relay..."))
+        run_relay(batch_size=options["batch_size"], poll_interval=options["interval"])
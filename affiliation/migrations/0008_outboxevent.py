@@ -0,0 +1,49 @@
+# Generated by Django 5.0 on 2026-10-15 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("affiliation", "0007_add_transfer_destination_api_url"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboxEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                (
+                    "event_type",
+                    models.CharField(
+                        help_text="Queue (routing key) the event is published to", max_length=255
+                    ),
+                ),
+                ("payload", models.JSONField(help_text="Message body sent to RabbitMQ")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "published_at",
+                    models.DateTimeField(
+                        blank=True, help_text="When the relay published the event", null=True
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Outbox Event",
+                "verbose_name_plural": "Outbox Events",
+                "db_table": "outbox_events",
+                "ordering": ["created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["published_at", "created_at"], name="outbox_even_publish_a907cb_idx"
+                    )
+                ],
+            },
+        ),
+    ]
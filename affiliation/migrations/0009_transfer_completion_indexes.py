@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-15 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("affiliation", "0008_outboxevent"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="affiliation",
+            index=models.Index(
+                fields=["status", "documents_ready"], name="affiliation_status_f82c00_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="citizen",
+            index=models.Index(
+                fields=["citizen_id", "is_verified"], name="citizens_citizen_13d9b1_idx"
+            ),
+        ),
+    ]
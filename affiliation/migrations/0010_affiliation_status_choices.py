@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-15 10:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("affiliation", "0009_transfer_completion_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="affiliation",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("AFFILIATED", "Affiliated"),
+                    ("TRANSFERRING", "Transferring"),
+                    ("TRANSFERRED", "Transferred"),
+                    ("PENDING_DELETION", "Pending Deletion"),
+                    ("FAILED", "Failed"),
+                    ("CANCELLED", "Cancelled"),
+                ],
+                db_index=True,
+                default="AFFILIATED",
+                help_text="Current affiliation status",
+                max_length=20,
+            ),
+        ),
+    ]
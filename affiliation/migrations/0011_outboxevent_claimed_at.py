@@ -0,0 +1,20 @@
+# Generated by Django 5.0 on 2026-10-15 10:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("affiliation", "0010_affiliation_status_choices"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outboxevent",
+            name="claimed_at",
+            field=models.DateTimeField(
+                blank=True, help_text="When a relay claimed the event for publishing", null=True
+            ),
+        ),
+    ]
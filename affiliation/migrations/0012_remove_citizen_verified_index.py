@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-15 10:49
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("affiliation", "0011_outboxevent_claimed_at"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="citizen",
+            name="citizens_citizen_13d9b1_idx",
+        ),
+    ]
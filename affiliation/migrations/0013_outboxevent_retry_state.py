@@ -0,0 +1,34 @@
+# Generated by Django 5.0 on 2026-10-15 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("affiliation", "0012_remove_citizen_verified_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outboxevent",
+            name="attempts",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Failed delivery attempts (transfer confirmations only)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="outboxevent",
+            name="failed_at",
+            field=models.DateTimeField(
+                blank=True, help_text="When the relay gave up on the event", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="outboxevent",
+            name="next_attempt_at",
+            field=models.DateTimeField(
+                blank=True, help_text="Earliest time the relay retries a failed delivery", null=True
+            ),
+        ),
+    ]
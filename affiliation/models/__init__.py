@@ -1,4 +1,5 @@
 from .citizen import Citizen
 from .affiliation import Affiliation
+from .outbox_event import OutboxEvent
 
-__all__ = ["Citizen", "Affiliation"]
+__all__ = ["Citizen", "Affiliation", "OutboxEvent"]
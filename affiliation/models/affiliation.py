@@ -8,11 +8,22 @@ class Affiliation(models.Model):
     Tracks the citizen's current status with the operator (affiliated, transferring, transferred).
     """
 
+    STATUS_PENDING = "PENDING"
+    STATUS_AFFILIATED = "AFFILIATED"
+    STATUS_TRANSFERRING = "TRANSFERRING"
+    STATUS_TRANSFERRED = "TRANSFERRED"
+    STATUS_PENDING_DELETION = "PENDING_DELETION"
+    STATUS_FAILED = "FAILED"
+    STATUS_CANCELLED = "CANCELLED"
+
     STATUS_CHOICES = [
-        ("AFFILIATED", "Affiliated"),  # Currently affiliated with this operator
-        ("TRANSFERRING", "Transferring"),  # In process of being transferred
-        ("TRANSFERRED", "Transferred"),  # Successfully transferred to another operator
-        ("CANCELLED", "Cancelled"),  # Affiliation cancelled/removed
+        (STATUS_PENDING, "Pending"),  # Waiting for MINTIC verification
+        (STATUS_AFFILIATED, "Affiliated"),  # Currently affiliated with this operator
+        (STATUS_TRANSFERRING, "Transferring"),  # In process of being transferred
+        (STATUS_TRANSFERRED, "Transferred"),  # Successfully transferred to another operator
+        (STATUS_PENDING_DELETION, "Pending Deletion"),  # Waiting for MINTIC unregister
+        (STATUS_FAILED, "Failed"),  # MINTIC registration failed
+        (STATUS_CANCELLED, "Cancelled"),  # Affiliation cancelled/removed
     ]
 
     citizen = models.OneToOneField(
@@ -30,7 +41,7 @@ class Affiliation(models.Model):
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
-        default="AFFILIATED",
+        default=STATUS_AFFILIATED,
         db_index=True,
         help_text="Current affiliation status",
     )
@@ -94,6 +105,7 @@ class Affiliation(models.Model):
         ordering = ["-affiliated_at"]
         indexes = [
             models.Index(fields=["status", "affiliated_at"]),
+            models.Index(fields=["status", "documents_ready"]),
             models.Index(fields=["operator_id"]),
         ]
         verbose_name = "Affiliation"
@@ -104,17 +116,17 @@ class Affiliation(models.Model):
 
     def start_transfer(self, destination_operator_id: str, destination_operator_name: str):
         """Mark affiliation as transferring to another operator."""
-        self.status = "TRANSFERRING"
+        self.status = self.STATUS_TRANSFERRING
         self.transfer_destination_operator_id = destination_operator_id
         self.transfer_destination_operator_name = destination_operator_name
         self.save()
 
     def complete_transfer(self):
         """Mark affiliation as transferred."""
-        self.status = "TRANSFERRED"
+        self.status = self.STATUS_TRANSFERRED
         self.save()
 
     def cancel_affiliation(self):
         """Cancel the affiliation."""
-        self.status = "CANCELLED"
+        self.status = self.STATUS_CANCELLED
         self.save()
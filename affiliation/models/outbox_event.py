@@ -0,0 +1,49 @@
+from django.db import models
+
+
+class OutboxEvent(models.Model):
+    """
+    Model representing an event waiting to be published to RabbitMQ.
+
+    Events are written in the same database transaction as the Citizen/Affiliation
+    changes that produce them, and a relay process publishes them afterwards.
+    """
+
+    event_type = models.CharField(
+        max_length=255, help_text="Queue (routing key) the event is published to"
+    )
+    payload = models.JSONField(help_text="Message body sent to RabbitMQ")
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(
+        blank=True, null=True, help_text="When the relay published the event"
+    )
+    claimed_at = models.DateTimeField(
+        blank=True, null=True, help_text="When a relay claimed the event for publishing"
+    )
+    attempts = models.PositiveIntegerField(
+        default=0, help_text="Failed delivery attempts (transfer confirmations only)"
+    )
+    next_attempt_at = models.DateTimeField(
+        blank=True, null=True, help_text="Earliest time the relay retries a failed delivery"
+    )
+    failed_at = models.DateTimeField(
+        blank=True, null=True, help_text="When the relay gave up on the event"
+    )
+
+    class Meta:
+        db_table = "outbox_events"
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["published_at", "created_at"]),
+        ]
+        verbose_name = "Outbox Event"
+        verbose_name_plural = "Outbox Events"
+
+    def __str__(self):
+        if self.published_at:
+            state = "published"
+        elif self.failed_at:
+            state = "failed"
+        else:
+            state = "pending"
+        return f"{self.event_type} ({state})"
@@ -0,0 +1,303 @@
+"""
+Transactional outbox for RabbitMQ events.
+
+Services record events with the enqueue_* functions inside the same database
+transaction as the state change that produces them. The relay
+(relay_pending_events / run_outbox_relay) publishes pending events afterwards,
+so a broker outage delays events instead of losing them. Confirmation callbacks
+to the operator that sent a transfer go through the same table; the relay
+retries them with backoff and gives up after CONFIRMATION_MAX_ATTEMPTS.
+"""
+
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from affiliation.models import OutboxEvent
+from affiliation.rabbitmq.publisher import get_publisher
+
+logger = logging.getLogger(__name__)
+
+# Event type for confirmation callbacks, which the relay delivers over HTTP
+TRANSFER_CONFIRMATION_EVENT = "transfer.confirmation"
+
+# Failed confirmations are retried after 30s, 1m, 2m, ... and marked failed after the last attempt
+CONFIRMATION_RETRY_DELAY = 30
+CONFIRMATION_MAX_ATTEMPTS = 8
+
+
+def enqueue_event(event_type: str, payload: dict) -> OutboxEvent:
+    """
+    Record an event to be published by the outbox relay.
+
+    Args:
+        event_type: The queue (routing key) the event is published to
+        payload: The message body
+
+    Returns:
+        OutboxEvent: The stored event
+    """
+    return OutboxEvent.objects.create(event_type=event_type, payload=payload)
+
+
+def enqueue_affiliation_created(id_citizen: int) -> OutboxEvent:
+    """
+    Record an affiliation.created event.
+
+    Args:
+        id_citizen: The citizen ID that was affiliated
+    """
+    return enqueue_event(settings.RABBITMQ_AFFILIATION_CREATED_QUEUE, {"idCitizen": id_citizen})
+
+
+def enqueue_user_transferred(id_citizen: int) -> OutboxEvent:
+    """
+    Record a user.transferred event.
+
+    Args:
+        id_citizen: The citizen ID that was transferred
+    """
+    return enqueue_event(settings.RABBITMQ_USER_TRANSFERRED_QUEUE, {"idCitizen": id_citizen})
+
+
+def enqueue_documents_download_requested(id_citizen: int, url_documents: dict) -> OutboxEvent:
+    """
+    Record a documents.download.requested event for Document Service.
+
+    Args:
+        id_citizen: The citizen ID
+        url_documents: Dictionary of document URLs to download
+    """
+    return enqueue_event(
+        settings.RABBITMQ_DOCUMENTS_DOWNLOAD_REQUESTED_QUEUE,
+        {"idCitizen": id_citizen, "urlDocuments": url_documents},
+    )
+
+
+def enqueue_register_citizen_requested(citizen_data: dict) -> OutboxEvent:
+    """
+    Record a register.citizen.requested event for Operator Connectivity.
+
+    Args:
+        citizen_data: Dictionary containing id, name, address, email,
+            operatorId and operatorName
+    """
+    return enqueue_event(
+        settings.RABBITMQ_REGISTER_CITIZEN_REQUESTED_QUEUE,
+        {
+            "id": citizen_data.get("id"),
+            "name": citizen_data.get("name"),
+            "address": citizen_data.get("address"),
+            "email": citizen_data.get("email"),
+            "operatorId": citizen_data.get("operatorId"),
+            "operatorName": citizen_data.get("operatorName"),
+        },
+    )
+
+
+def enqueue_unregister_citizen_requested(citizen_data: dict) -> OutboxEvent:
+    """
+    Record an unregister.citizen.requested event for Operator Connectivity.
+
+    Args:
+        citizen_data: Dictionary containing id, operatorId and operatorName
+    """
+    return enqueue_event(
+        settings.RABBITMQ_UNREGISTER_CITIZEN_REQUESTED_QUEUE,
+        {
+            "id": citizen_data.get("id"),
+            "operatorId": citizen_data.get("operatorId"),
+            "operatorName": citizen_data.get("operatorName"),
+        },
+    )
+
+
+def enqueue_transfer_confirmation(
+    confirmation_url: str, id_citizen: int, req_status: int
+) -> OutboxEvent:
+    """
+    Record a confirmation callback for the operator that sent us a transfer.
+
+    Unlike the other events this one is not published to RabbitMQ; the relay
+    POSTs it to the sending operator's confirmAPI.
+
+    Args:
+        confirmation_url: The sending operator's confirmAPI URL
+        id_citizen: The transferred citizen ID
+        req_status: 1 for success, 0 for failure
+    """
+    return enqueue_event(
+        TRANSFER_CONFIRMATION_EVENT,
+        {"confirmAPI": confirmation_url, "id": id_citizen, "req_status": req_status},
+    )
+
+
+def _deliver_transfer_confirmation(payload: dict) -> bool:
+    """Call the sending operator's confirmAPI for a transfer.confirmation event."""
+    from affiliation.services.transfer_service import TransferService
+
+    return TransferService()._send_confirmation(
+        payload["confirmAPI"], payload["id"], status=payload["req_status"]
+    )
+
+
+def _claim_events(queryset, batch_size: int, claim_timeout: float) -> list:
+    """
+    Claim up to batch_size due events from queryset for this relay.
+
+    The rows are locked with SKIP LOCKED and stamped with claimed_at in a short
+    transaction, so they can be delivered after it commits without holding a
+    row lock while waiting on the broker or an operator. Claims older than
+    claim_timeout seconds are taken over, which recovers events claimed by a
+    relay that died mid-batch (such events may be delivered twice).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            queryset.select_for_update(skip_locked=True)
+            .filter(published_at__isnull=True, failed_at__isnull=True)
+            .filter(
+                Q(claimed_at__isnull=True)
+                | Q(claimed_at__lt=now - timedelta(seconds=claim_timeout))
+            )
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+            .order_by("created_at", "id")[:batch_size]
+        )
+        if events:
+            OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).update(claimed_at=now)
+    return events
+
+
+def _publish_broker_events(batch_size: int, claim_timeout: float) -> int:
+    """Publish one claimed batch of RabbitMQ events; returns how many were published."""
+    events = _claim_events(
+        OutboxEvent.objects.exclude(event_type=TRANSFER_CONFIRMATION_EVENT),
+        batch_size,
+        claim_timeout,
+    )
+    if not events:
+        return 0
+
+    event_ids = [event.pk for event in events]
+    published = False
+    try:
+        messages = [(event.event_type, event.payload) for event in events]
+        published = get_publisher().publish_batch(messages)
+        if not published:
+            logger.warning(f"Outbox relay could not publish {len(events)} event(s)")
+    finally:
+        if published:
+            OutboxEvent.objects.filter(pk__in=event_ids).update(published_at=timezone.now())
+        else:
+            # Release the batch so the next call retries it right away
+            OutboxEvent.objects.filter(pk__in=event_ids).update(claimed_at=None)
+
+    return len(events) if published else 0
+
+
+def _schedule_confirmation_retry(event: OutboxEvent):
+    """Back off a failed transfer confirmation, or give up after the last attempt."""
+    attempts = event.attempts + 1
+    now = timezone.now()
+    if attempts >= CONFIRMATION_MAX_ATTEMPTS:
+        logger.error(
+            f"Giving up on transfer confirmation {event.pk} to {event.payload.get('confirmAPI')} "
+            f"after {attempts} attempts"
+        )
+        OutboxEvent.objects.filter(pk=event.pk).update(
+            attempts=attempts, claimed_at=None, failed_at=now
+        )
+        return
+
+    delay = CONFIRMATION_RETRY_DELAY * 2 ** (attempts - 1)
+    logger.warning(
+        f"Transfer confirmation {event.pk} failed (attempt {attempts}), retrying in {delay}s"
+    )
+    OutboxEvent.objects.filter(pk=event.pk).update(
+        attempts=attempts, claimed_at=None, next_attempt_at=now + timedelta(seconds=delay)
+    )
+
+
+def _deliver_confirmations(batch_size: int, claim_timeout: float) -> int:
+    """POST one claimed batch of transfer confirmations; returns how many were delivered."""
+    events = _claim_events(
+        OutboxEvent.objects.filter(event_type=TRANSFER_CONFIRMATION_EVENT),
+        batch_size,
+        claim_timeout,
+    )
+
+    delivered = 0
+    for event in events:
+        try:
+            confirmed = _deliver_transfer_confirmation(event.payload)
+        except Exception as e:
+            logger.error(f"Transfer confirmation {event.pk} could not be sent: {str(e)}")
+            confirmed = False
+
+        if confirmed:
+            OutboxEvent.objects.filter(pk=event.pk).update(published_at=timezone.now())
+            delivered += 1
+        else:
+            _schedule_confirmation_retry(event)
+
+    return delivered
+
+
+def relay_pending_events(batch_size: int = 100, claim_timeout: float = 300.0) -> int:
+    """
+    Publish one batch of pending outbox events.
+
+    RabbitMQ events and transfer confirmations are claimed separately, up to
+    batch_size of each, so operators that are slow or down can't crowd broker
+    events out of a batch. The RabbitMQ events are published together with a
+    single wait for the broker (see RabbitMQPublisher.publish_batch); if that
+    fails, the whole batch is released for the next call. Events are published
+    in creation order only when a single relay runs; parallel relays claim
+    disjoint batches and can interleave them.
+
+    Transfer confirmations are POSTed to the sending operator. One that fails
+    is retried with exponential backoff (CONFIRMATION_RETRY_DELAY doubled per
+    attempt) and is marked failed after CONFIRMATION_MAX_ATTEMPTS attempts.
+
+    Args:
+        batch_size: Maximum number of events of each kind to deliver
+        claim_timeout: Seconds after which another relay's claim is ignored
+
+    Returns:
+        int: Number of events published or delivered
+    """
+    published = _publish_broker_events(batch_size, claim_timeout)
+    delivered = _deliver_confirmations(batch_size, claim_timeout)
+
+    if published or delivered:
+        logger.info(
+            f"Outbox relay published {published} event(s) and delivered "
+            f"{delivered} confirmation(s)"
+        )
+    return published + delivered
+
+
+def run_relay(batch_size: int = 100, poll_interval: float = 1.0):
+    """
+    Relay pending outbox events forever.
+
+    Full batches are followed immediately by the next one; the relay only
+    sleeps when the outbox is drained or the broker is unavailable.
+
+    Args:
+        batch_size: Maximum number of events published per batch
+        poll_interval: Seconds to wait when there is nothing to publish
+    """
+    logger.info(f"Starting outbox relay (batch_size={batch_size})")
+    while True:
+        try:
+            published = relay_pending_events(batch_size)
+        except Exception as e:
+            logger.error(f"Outbox relay error: {str(e)}")
+            published = 0
+
+        if published < batch_size:
+            time.sleep(poll_interval)
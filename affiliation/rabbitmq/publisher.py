@@ -1,5 +1,6 @@
 import json
 import logging
+import threading
 import pika
 from django.conf import settings
 
@@ -13,6 +14,7 @@ class RabbitMQPublisher:
         """Initialize RabbitMQ publisher with configuration from settings."""
         self.connection = None
         self.channel = None
+        self.batch_channel = None
         self._initialize_connection()
 
     def _initialize_connection(self):
@@ -30,6 +32,15 @@ class RabbitMQPublisher:
             self.connection = pika.BlockingConnection(parameters)
             self.channel = self.connection.channel()
 
+            # Publisher confirms: basic_publish raises if the broker rejects a message,
+            # so a True return really means the event reached RabbitMQ
+            self.channel.confirm_delivery()
+
+            # Relay batches go through a transacted channel instead (a channel can't be in
+            # confirm and tx mode at once), so a whole batch costs one broker round trip
+            self.batch_channel = self.connection.channel()
+            self.batch_channel.tx_select()
+
             # Declare queues to ensure they exist
             self.channel.queue_declare(
                 queue=settings.RABBITMQ_AFFILIATION_CREATED_QUEUE, durable=True
@@ -58,6 +69,103 @@ class RabbitMQPublisher:
             logger.error(f"Failed to initialize RabbitMQ publisher: {str(e)}")
             self.connection = None
             self.channel = None
+            self.batch_channel = None
+
+    def _ensure_channel(self) -> bool:
+        """
+        Make sure there is an open channel, reconnecting if the previous one died.
+
+        Returns:
+            bool: True if a channel is ready for publishing
+        """
+        if (
+            self.channel
+            and self.channel.is_open
+            and self.batch_channel
+            and self.batch_channel.is_open
+        ):
+            return True
+
+        logger.warning("RabbitMQ channel not initialized, attempting to reconnect")
+        self._close()
+        self._initialize_connection()
+        if not self.channel:
+            logger.error("Failed to reconnect to RabbitMQ")
+            return False
+        return True
+
+    def publish(self, routing_key: str, message: dict) -> bool:
+        """
+        Publish an arbitrary JSON message to the given queue.
+        Used by the outbox relay, which stores the queue name with each event.
+
+        Args:
+            routing_key: The queue to publish to
+            message: The message body
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if not self._ensure_channel():
+            return False
+
+        try:
+            self.channel.basic_publish(
+                exchange="",
+                routing_key=routing_key,
+                body=json.dumps(message),
+                properties=pika.BasicProperties(
+                    delivery_mode=2, content_type="application/json"  # Make message persistent
+                ),
+            )
+
+            logger.info(f"Published {routing_key} event")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to publish {routing_key} event: {str(e)}")
+            # Try to reconnect for next time
+            self._close()
+            return False
+
+    def publish_batch(self, messages: list) -> bool:
+        """
+        Publish several JSON messages and wait for the broker once.
+        Used by the outbox relay to publish a claimed batch.
+
+        The messages are sent in one AMQP transaction: basic_publish doesn't wait
+        for the broker, and tx_commit returns once RabbitMQ has accepted every
+        message (or raises, in which case none of them were).
+
+        Args:
+            messages: (routing_key, message) pairs, in publishing order
+
+        Returns:
+            bool: True if the whole batch was committed, False otherwise
+        """
+        if not self._ensure_channel():
+            return False
+
+        try:
+            for routing_key, message in messages:
+                self.batch_channel.basic_publish(
+                    exchange="",
+                    routing_key=routing_key,
+                    body=json.dumps(message),
+                    properties=pika.BasicProperties(
+                        delivery_mode=2, content_type="application/json"  # Make message persistent
+                    ),
+                )
+            self.batch_channel.tx_commit()
+
+            logger.info(f"Published batch of {len(messages)} event(s)")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to publish batch of {len(messages)} event(s): {str(e)}")
+            # Try to reconnect for next time
+            self._close()
+            return False
 
     def publish_affiliation_created(self, id_citizen: int) -> bool:
         """
@@ -70,12 +178,8 @@ class RabbitMQPublisher:
         Returns:
             bool: True if successful, False otherwise
         """
-        if not self.channel:
-            logger.warning("RabbitMQ channel not initialized, attempting to reconnect")
-            self._initialize_connection()
-            if not self.channel:
-                logger.error("Failed to reconnect to RabbitMQ")
-                return False
+        if not self._ensure_channel():
+            return False
 
         try:
             message = {"idCitizen": id_citizen}
@@ -110,12 +214,8 @@ class RabbitMQPublisher:
         Returns:
             bool: True if successful, False otherwise
         """
-        if not self.channel:
-            logger.warning("RabbitMQ channel not initialized, attempting to reconnect")
-            self._initialize_connection()
-            if not self.channel:
-                logger.error("Failed to reconnect to RabbitMQ")
-                return False
+        if not self._ensure_channel():
+            return False
 
         try:
             message = {"idCitizen": id_citizen}
@@ -151,12 +251,8 @@ class RabbitMQPublisher:
         Returns:
             bool: True if successful, False otherwise
         """
-        if not self.channel:
-            logger.warning("RabbitMQ channel not initialized, attempting to reconnect")
-            self._initialize_connection()
-            if not self.channel:
-                logger.error("Failed to reconnect to RabbitMQ")
-                return False
+        if not self._ensure_channel():
+            return False
 
         try:
             message = {"idCitizen": id_citizen, "urlDocuments": url_documents}
@@ -191,12 +287,8 @@ class RabbitMQPublisher:
         Returns:
             bool: True if successful, False otherwise
         """
-        if not self.channel:
-            logger.warning("RabbitMQ channel not initialized, attempting to reconnect")
-            self._initialize_connection()
-            if not self.channel:
-                logger.error("Failed to reconnect to RabbitMQ")
-                return False
+        if not self._ensure_channel():
+            return False
 
         try:
             message = {
@@ -242,12 +334,8 @@ class RabbitMQPublisher:
         Returns:
             bool: True if successful, False otherwise
         """
-        if not self.channel:
-            logger.warning("RabbitMQ channel not initialized, attempting to reconnect")
-            self._initialize_connection()
-            if not self.channel:
-                logger.error("Failed to reconnect to RabbitMQ")
-                return False
+        if not self._ensure_channel():
+            return False
 
         try:
             message = {
@@ -279,12 +367,6 @@ class RabbitMQPublisher:
             self._close()
             return False
 
-        except Exception as e:
-            logger.error(f"Failed to publish documents.download.requested event: {str(e)}")
-            # Try to reconnect for next time
-            self._close()
-            return False
-
     def _close(self):
         """Close the RabbitMQ connection."""
         try:
@@ -296,22 +378,25 @@ class RabbitMQPublisher:
         finally:
             self.connection = None
             self.channel = None
+            self.batch_channel = None
 
     def __del__(self):
         """Cleanup on object destruction."""
         self._close()
 
 
-# Global publisher instance
-_publisher = None
+# Publisher instances, one per thread. pika's BlockingConnection is not thread-safe,
+# and the consumers and the outbox relay publish from their own threads.
+_local = threading.local()
 
 
 def get_publisher() -> RabbitMQPublisher:
-    """Get or create the global publisher instance."""
-    global _publisher
-    if _publisher is None:
-        _publisher = RabbitMQPublisher()
-    return _publisher
+    """Get or create the publisher instance for the current thread."""
+    publisher = getattr(_local, "publisher", None)
+    if publisher is None:
+        publisher = RabbitMQPublisher()
+        _local.publisher = publisher
+    return publisher
 
 
 def publish_affiliation_created(id_citizen: int) -> bool:
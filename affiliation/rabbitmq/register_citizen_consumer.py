@@ -53,6 +53,8 @@ def handle_register_citizen_completed(message: dict):
         message: The event message containing registration result from MINTIC API
     """
     try:
+        from django.db import transaction
+        from django.utils import timezone
         from affiliation.models import Citizen, Affiliation
 
         citizen_id = str(message.get("id"))
@@ -71,65 +73,75 @@ def handle_register_citizen_completed(message: dict):
         )
         print(f"    Status Code: {status_code}")
 
-        # Find the citizen
-        citizen = Citizen.objects.filter(citizen_id=citizen_id).first()
-        if not citizen:
-            logger.error(f"Citizen {citizen_id} not found in database")
-            print(f"❌ [RegisterCompleted] Citizen {citizen_id} not found")
-            return
+        now = timezone.now()
 
         if status_code == 201:
-            logger.info(
-                f"✅ [RegisterCompleted] Citizen {citizen_id} registered successfully with MINTIC"
-            )
-            print(f"✅ [RegisterCompleted] Success - Citizen registered in MINTIC")
-
-            # Update citizen verification status
-            citizen.is_verified = True
-            citizen.verification_status = Citizen.VERIFICATION_VERIFIED
-            citizen.verification_message = "Citizen successfully registered in MINTIC"
-            citizen.save()
-
-            # Check affiliation status
-            affiliation = Affiliation.objects.filter(citizen=citizen).first()
-            if affiliation:
-                # If citizen is being TRANSFERRED (incoming transfer), check if we can complete
-                if affiliation.status == "TRANSFERRING":
-                    logger.info(
-                        f"Citizen {citizen_id} is in TRANSFERRING status, checking if transfer can be completed"
-                    )
-                    from affiliation.services.transfer_service import TransferService
-
-                    transfer_service = TransferService()
-                    transfer_service.check_and_complete_transfer(citizen_id)
-                else:
-                    # Normal registration (not a transfer) - just update status
-                    affiliation.status = "AFFILIATED"
-                    affiliation.save()
+            with transaction.atomic():
+                # Update citizen verification status (a single UPDATE, no SELECT first)
+                updated = Citizen.objects.filter(citizen_id=citizen_id).update(
+                    is_verified=True,
+                    verification_status=Citizen.VERIFICATION_VERIFIED,
+                    verification_message="Citizen successfully registered in MINTIC",
+                    updated_at=now,
+                )
+                if not updated:
+                    logger.error(f"Citizen {citizen_id} not found in database")
+                    print(f"❌ [RegisterCompleted] Citizen {citizen_id} not found")
+                    return
+
+                logger.info(
+                    f"✅ [RegisterCompleted] Citizen {citizen_id} registered successfully with MINTIC"
+                )
+                print(f"✅ [RegisterCompleted] Success - Citizen registered in MINTIC")
+
+                # Normal registration (not a transfer) - just update status
+                affiliations = Affiliation.objects.filter(citizen__citizen_id=citizen_id)
+                if affiliations.exclude(status=Affiliation.STATUS_TRANSFERRING).update(
+                    status=Affiliation.STATUS_AFFILIATED, status_changed_at=now
+                ):
                     logger.info(
                         f"Updated affiliation status to AFFILIATED for citizen {citizen_id}"
                     )
+                    transferring = False
+                else:
+                    transferring = affiliations.exists()
+
+            # If citizen is being TRANSFERRED (incoming transfer), check if we can complete
+            if transferring:
+                logger.info(
+                    f"Citizen {citizen_id} is in TRANSFERRING status, checking if transfer can be completed"
+                )
+                from affiliation.services.transfer_service import TransferService
+
+                transfer_service = TransferService()
+                transfer_service.check_and_complete_transfer(citizen_id)
 
             print(f"✅ [RegisterCompleted] Citizen {citizen_id} now VERIFIED")
 
         else:
-            # Any status code other than 201 is a failure
-            logger.error(
-                f"❌ [RegisterCompleted] Failed to register citizen {citizen_id} - Status code: {status_code}"
-            )
-            print(f"❌ [RegisterCompleted] Error - Status code: {status_code}")
-
-            # Update citizen verification status to FAILED
-            citizen.is_verified = False
-            citizen.verification_status = Citizen.VERIFICATION_FAILED
-            citizen.verification_message = f"Registration failed with status code: {status_code}"
-            citizen.save()
-
-            # Update affiliation status to FAILED
-            affiliation = Affiliation.objects.filter(citizen=citizen).first()
-            if affiliation:
-                affiliation.status = "FAILED"
-                affiliation.save()
+            with transaction.atomic():
+                # Update citizen verification status to FAILED
+                updated = Citizen.objects.filter(citizen_id=citizen_id).update(
+                    is_verified=False,
+                    verification_status=Citizen.VERIFICATION_FAILED,
+                    verification_message=f"Registration failed with status code: {status_code}",
+                    updated_at=now,
+                )
+                if not updated:
+                    logger.error(f"Citizen {citizen_id} not found in database")
+                    print(f"❌ [RegisterCompleted] Citizen {citizen_id} not found")
+                    return
+
+                # Any status code other than 201 is a failure
+                logger.error(
+                    f"❌ [RegisterCompleted] Failed to register citizen {citizen_id} - Status code: {status_code}"
+                )
+                print(f"❌ [RegisterCompleted] Error - Status code: {status_code}")
+
+                # Update affiliation status to FAILED
+                Affiliation.objects.filter(citizen__citizen_id=citizen_id).update(
+                    status=Affiliation.STATUS_FAILED, status_changed_at=now
+                )
 
             print(f"❌ [RegisterCompleted] Citizen {citizen_id} verification FAILED")
 
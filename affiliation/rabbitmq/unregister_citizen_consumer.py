@@ -53,8 +53,9 @@ def handle_unregister_citizen_completed(message: dict):
         message: The event message containing unregistration result
     """
     try:
+        from django.db import transaction
         from affiliation.models import Citizen, Affiliation
-        from affiliation.rabbitmq.publisher import publish_user_transferred
+        from affiliation.rabbitmq.outbox import enqueue_user_transferred
 
         citizen_id = str(message.get("id"))
         success = message.get("success", False)
@@ -71,7 +72,9 @@ def handle_unregister_citizen_completed(message: dict):
         )
 
         # Find the citizen
-        citizen = Citizen.objects.filter(citizen_id=citizen_id).first()
+        citizen = (
+            Citizen.objects.filter(citizen_id=citizen_id).select_related("affiliation").first()
+        )
         if not citizen:
             logger.warning(
                 f"Citizen {citizen_id} not found in database (may have been deleted already)"
@@ -86,9 +89,9 @@ def handle_unregister_citizen_completed(message: dict):
             print(f"✅ [UnregisterCompleted] Success: {msg}")
 
             # Check if citizen is being TRANSFERRED (outgoing transfer)
-            affiliation = Affiliation.objects.filter(citizen=citizen).first()
+            affiliation = getattr(citizen, "affiliation", None)
 
-            if affiliation and affiliation.status == "TRANSFERRING":
+            if affiliation and affiliation.status == Affiliation.STATUS_TRANSFERRING:
                 # This is an OUTGOING TRANSFER - continue the transfer process
                 logger.info(
                     f"🚀 [UnregisterCompleted] Citizen {citizen_id} is TRANSFERRING, continuing transfer flow"
@@ -120,24 +123,19 @@ def handle_unregister_citizen_completed(message: dict):
             # This is a DIRECT DELETION (not a transfer)
             logger.info(f"🗑️  [UnregisterCompleted] Direct deletion for citizen {citizen_id}")
 
-            # Publish user.transferred event for cleanup (documents, etc.)
-            try:
-                logger.info(f"Publishing user.transferred event for citizen {citizen_id}")
-                publish_user_transferred(int(citizen_id))
-                logger.info(f"Published user.transferred event for citizen {citizen_id}")
-            except Exception as e:
-                logger.error(
-                    f"Error publishing user.transferred event for citizen {citizen_id}: {str(e)}"
-                )
+            citizen_name = citizen.name
+            with transaction.atomic():
+                # Record user.transferred event for cleanup (documents, etc.)
+                enqueue_user_transferred(int(citizen_id))
 
-            # Delete affiliation first (foreign key relationship)
-            if affiliation:
-                affiliation.delete()
-                logger.info(f"Deleted affiliation for citizen {citizen_id}")
+                # Delete affiliation first (foreign key relationship)
+                if affiliation:
+                    affiliation.delete()
 
-            # Delete citizen
-            citizen_name = citizen.name
-            citizen.delete()
+                # Delete citizen
+                citizen.delete()
+
+            logger.info(f"Queued user.transferred event for citizen {citizen_id}")
             logger.info(f"Deleted citizen {citizen_id} ({citizen_name}) after MINTIC confirmation")
             print(f"✅ [UnregisterCompleted] Citizen {citizen_id} fully deleted")
 
@@ -158,9 +156,9 @@ def handle_unregister_citizen_completed(message: dict):
             citizen.save()
 
             # Rollback affiliation status
-            affiliation = Affiliation.objects.filter(citizen=citizen).first()
+            affiliation = getattr(citizen, "affiliation", None)
             if affiliation:
-                affiliation.status = "AFFILIATED"
+                affiliation.status = Affiliation.STATUS_AFFILIATED
                 affiliation.save()
 
             print(f"⚠️  [UnregisterCompleted] Kept citizen {citizen_id}, unregister failed")
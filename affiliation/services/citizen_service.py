@@ -1,9 +1,10 @@
 import requests
 from django.conf import settings
+from django.db import transaction
 from affiliation.models import Citizen, Affiliation
-from affiliation.rabbitmq.publisher import (
-    publish_register_citizen_requested,
-    publish_unregister_citizen_requested,
+from affiliation.rabbitmq.outbox import (
+    enqueue_register_citizen_requested,
+    enqueue_unregister_citizen_requested,
 )
 import logging
 
@@ -74,43 +75,39 @@ class CitizenService:
             return {"success": False, "message": validation["message"]}
 
         try:
-            # Create citizen locally with pending verification status
-            citizen = Citizen.objects.create(
-                citizen_id=citizen_id,
-                name=citizen_data["name"],
-                address=citizen_data["address"],
-                email=citizen_data["email"],
-                operator_id=citizen_data["operator_id"],
-                operator_name=citizen_data["operator_name"],
-                is_registered=True,  # Registered locally
-                is_verified=False,  # Not yet verified by MINTIC
-                verification_status=Citizen.VERIFICATION_PENDING,
-                verification_message="Waiting for MINTIC verification",
-            )
-
-            # Create affiliation record with PENDING status
-            Affiliation.objects.create(
-                citizen=citizen,
-                operator_id=citizen_data["operator_id"],
-                operator_name=citizen_data["operator_name"],
-                status="PENDING",  # Will change to AFFILIATED after verification
-            )
-
-            # Publish event for Operator Connectivity to register with MINTIC
-            event_payload = {
-                "id": int(citizen_id),
-                "name": citizen_data["name"],
-                "address": citizen_data["address"],
-                "email": citizen_data["email"],
-                "operatorId": citizen_data["operator_id"],
-                "operatorName": citizen_data["operator_name"],
-            }
+            with transaction.atomic():
+                # Create citizen locally with pending verification status
+                citizen = Citizen.objects.create(
+                    citizen_id=citizen_id,
+                    name=citizen_data["name"],
+                    address=citizen_data["address"],
+                    email=citizen_data["email"],
+                    operator_id=citizen_data["operator_id"],
+                    operator_name=citizen_data["operator_name"],
+                    is_registered=True,  # Registered locally
+                    is_verified=False,  # Not yet verified by MINTIC
+                    verification_status=Citizen.VERIFICATION_PENDING,
+                    verification_message="Waiting for MINTIC verification",
+                )
 
-            success = publish_register_citizen_requested(event_payload)
+                # Create affiliation record with PENDING status
+                Affiliation.objects.create(
+                    citizen=citizen,
+                    operator_id=citizen_data["operator_id"],
+                    operator_name=citizen_data["operator_name"],
+                    status=Affiliation.STATUS_PENDING,  # Will change to AFFILIATED after verification
+                )
 
-            if not success:
-                logger.warning(
-                    f"Failed to publish register event for citizen {citizen_id}, but citizen created locally"
+                # Record event for Operator Connectivity to register with MINTIC
+                enqueue_register_citizen_requested(
+                    {
+                        "id": int(citizen_id),
+                        "name": citizen_data["name"],
+                        "address": citizen_data["address"],
+                        "email": citizen_data["email"],
+                        "operatorId": citizen_data["operator_id"],
+                        "operatorName": citizen_data["operator_name"],
+                    }
                 )
 
             return {
@@ -135,12 +132,15 @@ class CitizenService:
             dict: Contains 'success' boolean, 'data' with affiliation info or 'message' string
         """
         try:
-            citizen = Citizen.objects.filter(citizen_id=citizen_id).first()
+            citizen = (
+                Citizen.objects.filter(citizen_id=citizen_id).select_related("affiliation").first()
+            )
 
             if not citizen:
                 return {"success": False, "message": f"Citizen {citizen_id} not found"}
 
-            affiliation = Affiliation.objects.filter(citizen=citizen).first()
+            # Loaded by select_related; a missing affiliation raises without querying
+            affiliation = getattr(citizen, "affiliation", None)
 
             if not affiliation:
                 return {
@@ -174,7 +174,7 @@ class CitizenService:
 
         Steps:
         1. Mark citizen as pending_deletion=True
-        2. Publish unregister.citizen.requested event
+        2. Record unregister.citizen.requested event in the outbox (same transaction)
         3. Wait for unregister.citizen.completed event (consumer handles actual deletion)
 
         Args:
@@ -184,7 +184,9 @@ class CitizenService:
             dict: Contains 'success' boolean and 'message' string
         """
         try:
-            citizen = Citizen.objects.filter(citizen_id=citizen_id).first()
+            citizen = (
+                Citizen.objects.filter(citizen_id=citizen_id).select_related("affiliation").first()
+            )
 
             if not citizen:
                 return {"success": False, "message": f"Citizen {citizen_id} not found"}
@@ -195,39 +197,26 @@ class CitizenService:
                     "message": f"Citizen {citizen_id} is already pending deletion, waiting for MINTIC confirmation",
                 }
 
-            operator_id = citizen.operator_id
-            operator_name = citizen.operator_name
-
-            # Mark citizen as pending deletion
-            citizen.pending_deletion = True
-            citizen.verification_message = "Waiting for MINTIC unregister confirmation"
-            citizen.save()
-
-            # Update affiliation status to PENDING_DELETION
-            affiliation = Affiliation.objects.filter(citizen=citizen).first()
-            if affiliation:
-                affiliation.status = "PENDING_DELETION"
-                affiliation.save()
-
-            # Publish unregister event for Operator Connectivity
-            event_payload = {
-                "id": int(citizen_id),
-                "operatorId": operator_id,
-                "operatorName": operator_name,
-            }
-
-            success = publish_unregister_citizen_requested(event_payload)
-
-            if not success:
-                logger.warning(f"Failed to publish unregister event for citizen {citizen_id}")
-                # Rollback pending deletion status
-                citizen.pending_deletion = False
-                citizen.verification_message = None
+            with transaction.atomic():
+                # Mark citizen as pending deletion
+                citizen.pending_deletion = True
+                citizen.verification_message = "Waiting for MINTIC unregister confirmation"
                 citizen.save()
+
+                # Update affiliation status to PENDING_DELETION
+                affiliation = getattr(citizen, "affiliation", None)
                 if affiliation:
-                    affiliation.status = "AFFILIATED"
+                    affiliation.status = Affiliation.STATUS_PENDING_DELETION
                     affiliation.save()
-                return {"success": False, "message": "Failed to publish unregister event"}
+
+                # Record unregister event for Operator Connectivity
+                enqueue_unregister_citizen_requested(
+                    {
+                        "id": int(citizen_id),
+                        "operatorId": citizen.operator_id,
+                        "operatorName": citizen.operator_name,
+                    }
+                )
 
             logger.info(
                 f"Marked citizen {citizen_id} for deletion, waiting for MINTIC confirmation"
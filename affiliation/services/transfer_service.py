@@ -1,13 +1,16 @@
 import requests
 import logging
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from affiliation.models import Citizen, Affiliation
-from affiliation.rabbitmq.publisher import (
-    publish_documents_download_requested,
-    publish_affiliation_created,
-    publish_user_transferred,
-    publish_unregister_citizen_requested,
+from affiliation.rabbitmq.outbox import (
+    enqueue_documents_download_requested,
+    enqueue_affiliation_created,
+    enqueue_register_citizen_requested,
+    enqueue_transfer_confirmation,
+    enqueue_user_transferred,
+    enqueue_unregister_citizen_requested,
 )
 
 logger = logging.getLogger(__name__)
@@ -23,7 +26,7 @@ class TransferService:
         This initiates the transfer process:
         1. Create citizen record (not verified, not registered yet)
         2. Create affiliation with TRANSFERRING status
-        3. Publish event for document service to download files
+        3. Record event for document service to download files (outbox)
         4. Wait for TWO events:
            - documents.ready (documents downloaded)
            - register.citizen.completed (MINTIC registration confirmed)
@@ -48,36 +51,37 @@ class TransferService:
             return {"success": False, "message": f"Citizen with id {citizen_id} already exists"}
 
         try:
-            # Create citizen record (not registered, not verified - waiting for documents AND MINTIC)
-            citizen = Citizen.objects.create(
-                citizen_id=citizen_id,
-                name=transfer_data["citizenName"],
-                address="",  # Will be updated when documents are processed
-                email=transfer_data["citizenEmail"],
-                operator_id=settings.OPERATOR_ID,
-                operator_name=settings.OPERATOR_NAME,
-                is_registered=False,  # Not complete until MINTIC confirms
-                is_verified=False,  # Waiting for MINTIC verification
-                verification_status="pending",
-                verification_message="Waiting for documents and MINTIC verification",
-            )
+            with transaction.atomic():
+                # Create citizen record (not registered, not verified - waiting for documents AND MINTIC)
+                citizen = Citizen.objects.create(
+                    citizen_id=citizen_id,
+                    name=transfer_data["citizenName"],
+                    address="",  # Will be updated when documents are processed
+                    email=transfer_data["citizenEmail"],
+                    operator_id=settings.OPERATOR_ID,
+                    operator_name=settings.OPERATOR_NAME,
+                    is_registered=False,  # Not complete until MINTIC confirms
+                    is_verified=False,  # Waiting for MINTIC verification
+                    verification_status="pending",
+                    verification_message="Waiting for documents and MINTIC verification",
+                )
 
-            # Create affiliation with TRANSFERRING status
-            affiliation = Affiliation.objects.create(
-                citizen=citizen,
-                operator_id=settings.OPERATOR_ID,
-                operator_name=settings.OPERATOR_NAME,
-                status="TRANSFERRING",
-                transfer_confirmation_url=transfer_data["confirmAPI"],
-                transfer_started_at=timezone.now(),
-                documents_ready=False,
-            )
+                # Create affiliation with TRANSFERRING status
+                Affiliation.objects.create(
+                    citizen=citizen,
+                    operator_id=settings.OPERATOR_ID,
+                    operator_name=settings.OPERATOR_NAME,
+                    status=Affiliation.STATUS_TRANSFERRING,
+                    transfer_confirmation_url=transfer_data["confirmAPI"],
+                    transfer_started_at=timezone.now(),
+                    documents_ready=False,
+                )
 
-            # Publish event for document service to download files
-            url_documents = transfer_data.get("urlDocuments", {})
-            publish_documents_download_requested(
-                id_citizen=int(citizen_id), url_documents=url_documents
-            )
+                # Record event for document service to download files
+                url_documents = transfer_data.get("urlDocuments", {})
+                enqueue_documents_download_requested(
+                    id_citizen=int(citizen_id), url_documents=url_documents
+                )
 
             logger.info(f"Transfer initiated for citizen {citizen_id}, waiting for documents")
 
@@ -89,9 +93,6 @@ class TransferService:
 
         except Exception as e:
             logger.error(f"Error receiving transfer for citizen {citizen_id}: {str(e)}")
-            # Rollback if citizen was created
-            if "citizen" in locals():
-                citizen.delete()
             return {"success": False, "message": f"Error processing transfer: {str(e)}"}
 
     def complete_transfer_after_documents(self, citizen_id: str) -> dict:
@@ -112,30 +113,28 @@ class TransferService:
             dict: Contains 'success' boolean and 'message' string
         """
         try:
-            citizen = Citizen.objects.get(citizen_id=citizen_id)
+            citizen = Citizen.objects.select_related("affiliation").get(citizen_id=citizen_id)
             affiliation = citizen.affiliation
 
-            # Mark documents as ready
-            affiliation.documents_ready = True
-            affiliation.save()
-
-            logger.info(f"Documents ready for citizen {citizen_id}")
+            with transaction.atomic():
+                # Mark documents as ready
+                affiliation.documents_ready = True
+                affiliation.save()
 
-            # Now publish register.citizen.requested to register in MINTIC
-            from affiliation.rabbitmq.publisher import publish_register_citizen_requested
-
-            publish_register_citizen_requested(
-                {
-                    "id": int(citizen_id),
-                    "name": citizen.name,
-                    "address": citizen.address if hasattr(citizen, "address") else "",
-                    "email": citizen.email,
-                    "operatorId": settings.OPERATOR_ID,
-                    "operatorName": settings.OPERATOR_NAME,
-                }
-            )
+                # Now request registration in MINTIC
+                enqueue_register_citizen_requested(
+                    {
+                        "id": int(citizen_id),
+                        "name": citizen.name,
+                        "address": citizen.address if hasattr(citizen, "address") else "",
+                        "email": citizen.email,
+                        "operatorId": settings.OPERATOR_ID,
+                        "operatorName": settings.OPERATOR_NAME,
+                    }
+                )
 
-            logger.info(f"Published register.citizen.requested for citizen {citizen_id}")
+            logger.info(f"Documents ready for citizen {citizen_id}")
+            logger.info(f"Queued register.citizen.requested for citizen {citizen_id}")
 
             # Check if we can complete the transfer now
             # (in case MINTIC already responded before documents were ready)
@@ -169,76 +168,101 @@ class TransferService:
             dict: Contains 'success' boolean and 'message' string
         """
         try:
-            citizen = Citizen.objects.get(citizen_id=citizen_id)
-            affiliation = citizen.affiliation
-
-            # Check if affiliation is in TRANSFERRING status
-            if affiliation.status != "TRANSFERRING":
-                logger.info(
-                    f"Citizen {citizen_id} is not in TRANSFERRING status, skipping completion check"
+            now = timezone.now()
+
+            with transaction.atomic():
+                # Claim the transfer: lock the affiliation once both events are in and
+                # flip it TRANSFERRING -> AFFILIATED. Calls made while an event is still
+                # pending, and duplicate deliveries after completion, find no row.
+                affiliation = (
+                    Affiliation.objects.select_for_update()
+                    .filter(
+                        citizen__citizen_id=citizen_id,
+                        status=Affiliation.STATUS_TRANSFERRING,
+                        documents_ready=True,
+                        citizen__is_verified=True,
+                    )
+                    .only("pk", "transfer_confirmation_url")
+                    .first()
                 )
-                return {
-                    "success": False,
-                    "message": f"Citizen {citizen_id} is not being transferred",
-                }
-
-            # Check if BOTH conditions are met
-            documents_ready = affiliation.documents_ready
-            mintic_verified = citizen.is_verified
+                claimed = 0
+                if affiliation is not None:
+                    claimed = Affiliation.objects.filter(
+                        pk=affiliation.pk, status=Affiliation.STATUS_TRANSFERRING
+                    ).update(
+                        status=Affiliation.STATUS_AFFILIATED,
+                        transfer_completed_at=now,
+                        status_changed_at=now,
+                    )
 
-            logger.info(
-                f"Transfer completion check for {citizen_id}: documents_ready={documents_ready}, mintic_verified={mintic_verified}"
-            )
+                if not claimed:
+                    message = self._transfer_not_completed_reason(citizen_id)
+                    logger.info(f"Transfer not completed for {citizen_id}: {message}")
+                    return {"success": False, "message": message}
 
-            if documents_ready and mintic_verified:
                 # BOTH conditions met - complete the transfer!
                 logger.info(
                     f"🎉 Both conditions met for citizen {citizen_id}! Completing transfer..."
                 )
 
                 # Update citizen to registered
-                citizen.is_registered = True
-                citizen.save()
+                Citizen.objects.filter(citizen_id=citizen_id).update(
+                    is_registered=True, updated_at=now
+                )
 
-                # Update affiliation status to AFFILIATED
-                affiliation.status = "AFFILIATED"
-                affiliation.transfer_completed_at = timezone.now()
-                affiliation.save()
+                # Record affiliation.created event
+                enqueue_affiliation_created(int(citizen_id))
 
-                # Call confirmation API to notify sending operator
+                # Record the confirmation for the sending operator; the outbox relay
+                # calls their API and keeps retrying until it gets through
                 if affiliation.transfer_confirmation_url:
-                    self._send_confirmation(
-                        confirmation_url=affiliation.transfer_confirmation_url,
-                        citizen_id=citizen_id,
-                        status=1,  # Success
+                    enqueue_transfer_confirmation(
+                        affiliation.transfer_confirmation_url,
+                        id_citizen=int(citizen_id),
+                        req_status=1,  # Success
                     )
 
-                # Publish affiliation.created event
-                publish_affiliation_created(int(citizen_id))
-
-                logger.info(f"✅ Transfer completed for citizen {citizen_id}")
-
-                return {"success": True, "message": f"Transfer completed for citizen {citizen_id}"}
-            else:
-                # Still waiting for one or both conditions
-                waiting_for = []
-                if not documents_ready:
-                    waiting_for.append("documents")
-                if not mintic_verified:
-                    waiting_for.append("MINTIC verification")
-
-                message = f"Waiting for: {', '.join(waiting_for)}"
-                logger.info(f"Transfer not yet complete for {citizen_id}: {message}")
+            logger.info(f"✅ Transfer completed for citizen {citizen_id}")
 
-                return {"success": False, "message": message}
+            return {"success": True, "message": f"Transfer completed for citizen {citizen_id}"}
 
-        except Citizen.DoesNotExist:
-            logger.error(f"Citizen {citizen_id} not found for transfer completion check")
-            return {"success": False, "message": f"Citizen {citizen_id} not found"}
         except Exception as e:
             logger.error(f"Error checking transfer completion for citizen {citizen_id}: {str(e)}")
             return {"success": False, "message": f"Error checking transfer completion: {str(e)}"}
 
+    def _transfer_not_completed_reason(self, citizen_id: str) -> str:
+        """
+        Explain why check_and_complete_transfer() could not claim a transfer.
+
+        Only runs when the locked claim finds no row, so the common path keeps
+        its single query.
+
+        Args:
+            citizen_id: The citizen ID
+
+        Returns:
+            str: Message naming the missing affiliation, wrong status or pending events
+        """
+        state = (
+            Affiliation.objects.filter(citizen__citizen_id=citizen_id)
+            .values("status", "documents_ready", "citizen__is_verified")
+            .first()
+        )
+        if state is None:
+            return f"No affiliation found for citizen {citizen_id}"
+        if state["status"] != Affiliation.STATUS_TRANSFERRING:
+            return f"Citizen {citizen_id} is not being transferred (status: {state['status']})"
+
+        missing = []
+        if not state["documents_ready"]:
+            missing.append("documents")
+        if not state["citizen__is_verified"]:
+            missing.append("MINTIC verification")
+        if not missing:
+            # Both events are in: another call claimed the transfer first
+            return f"Transfer for citizen {citizen_id} is already being completed"
+        return f"Transfer for citizen {citizen_id} is waiting for {' and '.join(missing)}"
+
     def continue_transfer_after_unregister(self, citizen_id: str) -> dict:
         """
         Continue outgoing transfer after MINTIC unregister confirmation.
@@ -258,11 +282,16 @@ class TransferService:
             dict: Contains 'success' boolean and 'message' string
         """
         try:
-            citizen = Citizen.objects.get(citizen_id=citizen_id)
-            affiliation = citizen.affiliation
+            # Only a handful of columns are needed to build the transfer request,
+            # so read them as a single row instead of instantiating both models
+            transfer = (
+                Affiliation.objects.filter(citizen__citizen_id=citizen_id)
+                .values("status", "transfer_destination_api_url", "citizen__name", "citizen__email")
+                .get()
+            )
 
             # Check if affiliation is in TRANSFERRING status
-            if affiliation.status != "TRANSFERRING":
+            if transfer["status"] != Affiliation.STATUS_TRANSFERRING:
                 logger.info(
                     f"Citizen {citizen_id} is not in TRANSFERRING status, skipping transfer continuation"
                 )
@@ -284,15 +313,15 @@ class TransferService:
 
             transfer_payload = {
                 "id": int(citizen_id),
-                "citizenName": citizen.name,
-                "citizenEmail": citizen.email,
+                "citizenName": transfer["citizen__name"],
+                "citizenEmail": transfer["citizen__email"],
                 "urlDocuments": url_documents,
                 "confirmAPI": confirmation_url,
             }
 
             # Step 2: Call receiving operator's transfer API
             # Get the target API URL that was saved when transfer was initiated
-            target_api_url = affiliation.transfer_destination_api_url
+            target_api_url = transfer["transfer_destination_api_url"]
 
             if not target_api_url:
                 logger.error(f"No target API URL found for citizen {citizen_id}")
@@ -322,7 +351,7 @@ class TransferService:
                 "citizen_id": citizen_id,
             }
 
-        except Citizen.DoesNotExist:
+        except Affiliation.DoesNotExist:
             logger.error(f"Citizen {citizen_id} not found for transfer continuation")
             return {"success": False, "message": f"Citizen {citizen_id} not found"}
         except Exception as e:
@@ -335,7 +364,7 @@ class TransferService:
 
         EVENT-DRIVEN FLOW:
         1. Mark Affiliation as 'TRANSFERRING'
-        2. Publish unregister.citizen.requested event (non-blocking)
+        2. Record unregister.citizen.requested event in the outbox (same transaction)
         3. Wait for unregister.citizen.completed event
         4. Consumer will call continue_transfer_after_unregister() to:
            - Get document URLs
@@ -355,53 +384,46 @@ class TransferService:
         """
         try:
             # Get citizen and affiliation
-            citizen = Citizen.objects.get(citizen_id=citizen_id)
-            affiliation = citizen.affiliation
+            citizen = Citizen.objects.select_related("affiliation").get(citizen_id=citizen_id)
 
-            # Check if citizen is currently affiliated (not already transferring)
-            if affiliation.status != "AFFILIATED":
+            # Loaded by select_related; a missing affiliation raises without querying
+            affiliation = getattr(citizen, "affiliation", None)
+            if not affiliation:
                 return {
                     "success": False,
-                    "message": f"Citizen {citizen_id} cannot be transferred (status: {affiliation.status})",
+                    "message": f"No affiliation found for citizen {citizen_id}",
                 }
 
-            # Step 1: Mark affiliation as TRANSFERRING and save target operator info
-            affiliation.status = "TRANSFERRING"
-            affiliation.transfer_destination_operator_id = target_operator["operator_id"]
-            affiliation.transfer_destination_operator_name = target_operator["operator_name"]
-            affiliation.transfer_destination_api_url = target_operator["api_url"]
-            affiliation.transfer_started_at = timezone.now()
-            affiliation.save()
-
-            logger.info(
-                f"Marked citizen {citizen_id} as TRANSFERRING to {target_operator['operator_name']}"
-            )
-
-            # Step 2: Publish unregister event (EVENT-DRIVEN, non-blocking)
-            # The unregister consumer will call continue_transfer_after_unregister()
-            # when MINTIC confirms the unregistration
-            event_payload = {
-                "id": int(citizen_id),
-                "operatorId": settings.OPERATOR_ID,
-                "operatorName": settings.OPERATOR_NAME,
-            }
-
-            success = publish_unregister_citizen_requested(event_payload)
-
-            if not success:
-                logger.error(f"Failed to publish unregister event for citizen {citizen_id}")
-                # Rollback TRANSFERRING status
-                affiliation.status = "AFFILIATED"
-                affiliation.transfer_destination_operator_id = None
-                affiliation.transfer_destination_operator_name = None
-                affiliation.save()
+            # Check if citizen is currently affiliated (not already transferring)
+            if affiliation.status != Affiliation.STATUS_AFFILIATED:
                 return {
                     "success": False,
-                    "message": "Failed to initiate transfer: could not publish unregister event",
+                    "message": f"Citizen {citizen_id} cannot be transferred (status: {affiliation.status})",
                 }
 
+            with transaction.atomic():
+                # Step 1: Mark affiliation as TRANSFERRING and save target operator info
+                affiliation.status = Affiliation.STATUS_TRANSFERRING
+                affiliation.transfer_destination_operator_id = target_operator["operator_id"]
+                affiliation.transfer_destination_operator_name = target_operator["operator_name"]
+                affiliation.transfer_destination_api_url = target_operator["api_url"]
+                affiliation.transfer_started_at = timezone.now()
+                affiliation.save()
+
+                # Step 2: Record unregister event (EVENT-DRIVEN, non-blocking)
+                # The unregister consumer will call continue_transfer_after_unregister()
+                # when MINTIC confirms the unregistration
+                enqueue_unregister_citizen_requested(
+                    {
+                        "id": int(citizen_id),
+                        "operatorId": settings.OPERATOR_ID,
+                        "operatorName": settings.OPERATOR_NAME,
+                    }
+                )
+
             logger.info(
-                f"Published unregister event for citizen {citizen_id}, waiting for MINTIC confirmation"
+                f"Marked citizen {citizen_id} as TRANSFERRING to {target_operator['operator_name']}, "
+                f"waiting for MINTIC confirmation"
             )
 
             # Step 3: Return immediately (optimistic UI)
@@ -436,29 +458,35 @@ class TransferService:
             dict: Contains 'success' boolean and 'message' string
         """
         try:
-            citizen = Citizen.objects.get(citizen_id=citizen_id)
+            citizen = Citizen.objects.select_related("affiliation").get(citizen_id=citizen_id)
             affiliation = citizen.affiliation
 
             if req_status == 1:
                 # Transfer successful - delete local data
                 logger.info(f"Transfer confirmed for citizen {citizen_id}. Deleting local data.")
 
-                # Update status before deletion (for audit trail)
-                affiliation.status = "TRANSFERRED"
-                affiliation.transfer_completed_at = timezone.now()
-                affiliation.save()
-
-                # Emit user.transferred event BEFORE deletion
-                # This notifies other services (document service, etc.) that citizen has been transferred
-                publish_user_transferred(int(citizen_id))
-                logger.info(f"Published user.transferred event for citizen {citizen_id}")
-
-                # Delete citizen and affiliation
                 citizen_name = citizen.name
                 operator_name = affiliation.transfer_destination_operator_name
 
-                affiliation.delete()
-                citizen.delete()
+                now = timezone.now()
+
+                with transaction.atomic():
+                    # Update status before deletion (for audit trail). update() skips
+                    # auto_now, so status_changed_at is stamped with the same timestamp
+                    Affiliation.objects.filter(citizen=citizen).update(
+                        status=Affiliation.STATUS_TRANSFERRED,
+                        transfer_completed_at=now,
+                        status_changed_at=now,
+                    )
+
+                    # Record user.transferred event in the same transaction as the deletion
+                    # This notifies other services (document service, etc.) that citizen has been transferred
+                    enqueue_user_transferred(int(citizen_id))
+
+                    # Delete citizen; the affiliation goes with it (on_delete=CASCADE)
+                    citizen.delete()
+
+                logger.info(f"Queued user.transferred event for citizen {citizen_id}")
 
                 logger.info(
                     f"Deleted citizen {citizen_id} ({citizen_name}) after successful transfer to {operator_name}"
@@ -472,7 +500,7 @@ class TransferService:
                 # Transfer failed - rollback status
                 logger.warning(f"Transfer failed for citizen {citizen_id}. Rolling back.")
 
-                affiliation.status = "AFFILIATED"
+                affiliation.status = Affiliation.STATUS_AFFILIATED
                 affiliation.transfer_destination_operator_id = None
                 affiliation.transfer_destination_operator_name = None
                 affiliation.save()
@@ -530,7 +558,7 @@ class TransferService:
             )
 
             response = requests.get(
-                document_api_url, headers={"Content-Type": "application/json"}, timeout=10
+                document_api_url, headers={"Accept": "application/json"}, timeout=10
             )
 
             if response.status_code == 200:
@@ -543,7 +571,7 @@ class TransferService:
                 else:
                     url_documents = documents_data
 
-                logger.info(
+                logger.debug(
                     f"Retrieved {len(url_documents)} document URL group(s) for citizen {citizen_id}"
                 )
                 return url_documents
@@ -568,24 +596,32 @@ class TransferService:
             logger.error(f"Error getting documents for citizen {citizen_id}: {str(e)}")
             return {}
 
-    def _send_confirmation(self, confirmation_url: str, citizen_id: str, status: int):
+    def _send_confirmation(self, confirmation_url: str, citizen_id: str, status: int) -> bool:
         """
         Send confirmation to the sending operator.
 
+        Called by the outbox relay, which leaves the confirmation pending and
+        retries it on a later run when this returns False.
+
         Args:
             confirmation_url: URL to call for confirmation
             citizen_id: The citizen ID
             status: 1 for success, 0 for failure
+
+        Returns:
+            bool: True if the sending operator accepted the confirmation
         """
-        try:
-            payload = {"id": int(citizen_id), "req_status": status}
+        payload = {"id": int(citizen_id), "req_status": status}
 
+        try:
             response = requests.post(confirmation_url, json=payload, timeout=10)
 
             if response.status_code == 200:
                 logger.info(f"Confirmation sent successfully for citizen {citizen_id}")
-            else:
-                logger.error(f"Failed to send confirmation: {response.text}")
+                return True
 
+            logger.error(f"Failed to send confirmation: {response.text}")
+            return False
         except Exception as e:
-            logger.error(f"Failed to send confirmation: {str(e)}")
+            logger.error(f"Failed to send confirmation for citizen {citizen_id}: {str(e)}")
+            return False
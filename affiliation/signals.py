@@ -1,12 +1,12 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from affiliation.models import Citizen
-from affiliation.rabbitmq.publisher import publish_affiliation_created
+from affiliation.rabbitmq.outbox import enqueue_affiliation_created
 
 
 @receiver(post_save, sender=Citizen)
 def citizen_post_save(sender, instance, created, **kwargs):
-    """Signal handler to publish RabbitMQ event when citizen is affiliated (registered)."""
+    """Signal handler to record an affiliation.created event when citizen is affiliated (registered)."""
     import logging
 
     logger = logging.getLogger(__name__)
@@ -20,8 +20,8 @@ def citizen_post_save(sender, instance, created, **kwargs):
         # Convert citizen_id to int (it's stored as string in DB)
         try:
             id_citizen = int(instance.citizen_id)
-            print(f"📤 [Signal] Publishing affiliation.created event for citizen {id_citizen}")
-            publish_affiliation_created(id_citizen)
+            print(f"📤 [Signal] Queueing affiliation.created event for citizen {id_citizen}")
+            enqueue_affiliation_created(id_citizen)
         except (ValueError, TypeError) as e:
             logger.error(
                 f"Failed to publish affiliation.created event: Invalid citizen_id {instance.citizen_id} - {str(e)}"
@@ -2,7 +2,6 @@
 Django settings for citizen affiliation service.
 """
 
-import os
 from pathlib import Path
 import environ
 
@@ -11,7 +10,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 # Environment variables
 env = environ.Env(DEBUG=(bool, False))
-environ.Env.read_env(os.path.join(BASE_DIR, ".env"))
+
+# Containers get their configuration from the environment and ship no .env file;
+# only read it when it exists, and let SKIP_DOTENV=1 bypass it entirely
+ENV_FILE = BASE_DIR / ".env"
+if not env.bool("SKIP_DOTENV", default=False) and ENV_FILE.is_file():
+    environ.Env.read_env(str(ENV_FILE))
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = env("SECRET_KEY", default="django-insecure-change-this-key")
@@ -70,6 +74,11 @@ WSGI_APPLICATION = "config.wsgi.application"
 # Database
 DATABASES = {"default": env.db("DATABASE_URL", default="sqlite:///db.sqlite3")}
 
+# Keep connections open between requests instead of reconnecting every time;
+# health checks replace connections the database closed in the meantime
+DATABASES["default"]["CONN_MAX_AGE"] = env.int("DB_CONN_MAX_AGE", default=60)
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -148,11 +157,10 @@ RABBITMQ_UNREGISTER_CITIZEN_COMPLETED_QUEUE = env(
 )
 
 # External API Configuration
-# External API Configuration
-GOVCARPETA_API_URL = os.getenv(
-    "GOVCARPETA_API_URL", "https://govcarpeta-apis-4905ff3c005b.herokuapp.com"
+GOVCARPETA_API_URL = env(
+    "GOVCARPETA_API_URL", default="https://govcarpeta-apis-4905ff3c005b.herokuapp.com"
 )
-DOCUMENT_SERVICE_URL = os.getenv("DOCUMENT_SERVICE_URL", "http://localhost:9000")
+DOCUMENT_SERVICE_URL = env("DOCUMENT_SERVICE_URL", default="http://localhost:9000")
 
 # Operator Configuration (Single operator system)
 OPERATOR_ID = env("OPERATOR_ID", default="68f003d9a49e090002e5d0b5")
@@ -171,12 +179,10 @@ LOGGING = {
     "disable_existing_loggers": False,
     "formatters": {
         "verbose": {
-            "format": "[{levelname}] {asctime} {name} - {message}",
-            "style": "{",
+            "format": "[%(levelname)s] %(asctime)s %(name)s - %(message)s",
         },
         "simple": {
-            "format": "[{levelname}] {message}",
-            "style": "{",
+            "format": "[%(levelname)s] %(message)s",
         },
     },
     "handlers": {
@@ -34,3 +34,18 @@ DEBUG = False
 
 # Use console email backend for tests
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+
+# Only the apps the tests exercise (the admin and its session/message apps are left out)
+INSTALLED_APPS = [
+    "django.contrib.contenttypes",
+    "django.contrib.auth",
+    "rest_framework",
+    "affiliation",
+]
+
+MIDDLEWARE = [
+    "django.middleware.common.CommonMiddleware",
+]
+
+# Same routes as config.urls, minus the admin that isn't installed here
+ROOT_URLCONF = "config.test_urls"
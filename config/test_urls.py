@@ -0,0 +1,12 @@
+"""
+URL configuration for tests - the production URLs without the admin.
+"""
+
+from django.urls import path, include
+from affiliation.api.health import health_check, readiness_check
+
+urlpatterns = [
+    path("api/v1/", include("affiliation.api.urls")),
+    path("api/health/", health_check, name="health_check"),
+    path("api/ready/", readiness_check, name="readiness_check"),
+]
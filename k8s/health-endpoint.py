@@ -1,16 +1,37 @@
 # Health check endpoint to add to your Django views
-# Add this to affiliation/api/views.py or create a new health.py file
+# Add this to affiliation/api/views.py; it reuses the database check in affiliation/api/health.py
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import connection
-from affiliation.rabbitmq.publisher import RabbitMQPublisher
 import logging
+import threading
+
+# The database check (and its short cache) is shared with the app's /api/health/ endpoint
+from affiliation.api.health import _database_is_healthy
 
 logger = logging.getLogger(__name__)
 
+# Probes hit this endpoint every few seconds: keep one RabbitMQ connection
+# around instead of opening (and leaking) a new one per request
+_publisher_singleton = None
+_publisher_lock = threading.Lock()
+
+
+def _rabbitmq_is_healthy():
+    """Reuse the cached publisher connection, reconnecting only when it is closed."""
+    global _publisher_singleton
+
+    # Imported here so loading the URLconf doesn't pull in pika
+    from affiliation.rabbitmq.publisher import RabbitMQPublisher
+
+    with _publisher_lock:
+        publisher = _publisher_singleton
+        if publisher is None or not (publisher.connection and publisher.connection.is_open):
+            _publisher_singleton = publisher = RabbitMQPublisher()
+        return bool(publisher.connection and publisher.connection.is_open)
+
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -29,7 +50,7 @@ def health_check(request):
     
     # Check database connection
     try:
-        connection.ensure_connection()
+        _database_is_healthy()
         health_status['checks']['database'] = 'ok'
     except Exception as e:
         logger.error(f"Database health check failed: {str(e)}")
@@ -38,7 +59,8 @@ def health_check(request):
     
     # Check RabbitMQ connection
     try:
-        publisher = RabbitMQPublisher()
+        if not _rabbitmq_is_healthy():
+            raise ConnectionError("RabbitMQ connection is closed")
         health_status['checks']['rabbitmq'] = 'ok'
     except Exception as e:
         logger.error(f"RabbitMQ health check failed: {str(e)}")
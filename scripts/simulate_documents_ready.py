@@ -5,85 +5,109 @@ Script to simulate the Document Service publishing a documents.ready event.
 This is used for testing the transfer flow without needing the actual Document Service.
 
 Usage:
-    python scripts/simulate_documents_ready.py <citizen_id>
+    python scripts/simulate_documents_ready.py <citizen_id> [<citizen_id> ...]
     
 Example:
     python scripts/simulate_documents_ready.py 5555666777
+    python scripts/simulate_documents_ready.py 5555666777 5555666778 5555666779
 """
+import argparse
 import os
 import sys
-import django
 
-# Setup Django
+# Only settings are needed here, so skip django.setup() and the app registry:
+# django.conf.settings loads the settings module lazily on first access
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
-django.setup()
 
 import json
 import pika
 from django.conf import settings
 
+# Connection parameters are the same for every publish, so build them once
+_PARAMS = pika.ConnectionParameters(
+    host=settings.RABBITMQ_HOST,
+    port=settings.RABBITMQ_PORT,
+    virtual_host=settings.RABBITMQ_VHOST,
+    credentials=pika.PlainCredentials(settings.RABBITMQ_USER, settings.RABBITMQ_PASSWORD),
+    heartbeat=30,
+    blocked_connection_timeout=5
+)
 
-def publish_documents_ready(citizen_id: int):
+
+def _connect():
     """
-    Publish a documents.ready event to RabbitMQ.
-    
+    Open a RabbitMQ connection with publisher confirms and the documents.ready queue declared.
+
+    Returns:
+        tuple: (connection, channel, queue_name)
+    """
+    connection = pika.BlockingConnection(_PARAMS)
+    channel = connection.channel()
+    channel.confirm_delivery()
+
+    # Declare the queue
+    queue_name = settings.RABBITMQ_DOCUMENTS_READY_QUEUE
+    channel.queue_declare(queue=queue_name, durable=True)
+
+    return connection, channel, queue_name
+
+
+def publish_documents_ready_batch(citizen_ids: list):
+    """
+    Publish documents.ready events for several citizens over a single connection.
+
     Args:
-        citizen_id: The citizen ID to publish the event for
+        citizen_ids: The citizen IDs to publish events for
     """
     try:
-        # Connect to RabbitMQ
-        credentials = pika.PlainCredentials(
-            settings.RABBITMQ_USER,
-            settings.RABBITMQ_PASSWORD
-        )
-        parameters = pika.ConnectionParameters(
-            host=settings.RABBITMQ_HOST,
-            port=settings.RABBITMQ_PORT,
-            virtual_host=settings.RABBITMQ_VHOST,
-            credentials=credentials
-        )
-        connection = pika.BlockingConnection(parameters)
-        channel = connection.channel()
-        
-        # Declare the queue
-        queue_name = settings.RABBITMQ_DOCUMENTS_READY_QUEUE
-        channel.queue_declare(queue=queue_name, durable=True)
-        
-        # Prepare message
-        message = {"idCitizen": citizen_id}
-        
-        # Publish message
-        channel.basic_publish(
-            exchange='',
-            routing_key=queue_name,
-            body=json.dumps(message),
-            properties=pika.BasicProperties(
-                delivery_mode=2,  # Make message persistent
-                content_type='application/json'
-            )
+        connection, channel, queue_name = _connect()
+
+        # Same properties for every message in the batch
+        properties = pika.BasicProperties(
+            delivery_mode=2,  # Make message persistent
+            content_type='application/json'
         )
-        
-        print(f"✅ Published documents.ready event for citizen {citizen_id}")
-        print(f"   Queue: {queue_name}")
-        print(f"   Message: {message}")
-        
-        connection.close()
-        
+
+        try:
+            for citizen_id in citizen_ids:
+                # Prepare message
+                message = {"idCitizen": citizen_id}
+
+                # Publish message as compact UTF-8 bytes so pika sends it as-is
+                channel.basic_publish(
+                    exchange='',
+                    routing_key=queue_name,
+                    body=json.dumps(message, separators=(',', ':')).encode(),
+                    properties=properties
+                )
+
+                print(f"✅ Published documents.ready event for citizen {citizen_id}")
+                print(f"   Queue: {queue_name}")
+                print(f"   Message: {message}")
+        finally:
+            connection.close()
+
     except Exception as e:
         print(f"❌ Error publishing message: {str(e)}")
         sys.exit(1)
 
 
+def publish_documents_ready(citizen_id: int):
+    """
+    Publish a documents.ready event to RabbitMQ.
+
+    Args:
+        citizen_id: The citizen ID to publish the event for
+    """
+    publish_documents_ready_batch([citizen_id])
+
+
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Usage: python scripts/simulate_documents_ready.py <citizen_id>")
-        print("Example: python scripts/simulate_documents_ready.py 5555666777")
-        sys.exit(1)
-    
-    try:
-        citizen_id = int(sys.argv[1])
-        publish_documents_ready(citizen_id)
-    except ValueError:
-        print("❌ Error: citizen_id must be a number")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Simulate the Document Service publishing documents.ready events."
+    )
+    parser.add_argument("citizen_ids", nargs="+", type=int, metavar="citizen_id")
+    args = parser.parse_args()
+
+    publish_documents_ready_batch(args.citizen_ids)
@@ -15,17 +15,14 @@ import os
 import sys
 import django
 
-# Setup Django
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
-django.setup()
-
-import requests
-from affiliation.models import Citizen, Affiliation
 
 
 def test_send_transfer(citizen_id):
     """Test sending a transfer to another operator."""
+    import requests
+    from affiliation.models import Citizen
     
     print(f"\n{'='*60}")
     print(f"Testing Phase 2: Send Transfer for Citizen {citizen_id}")
@@ -123,5 +120,8 @@ if __name__ == "__main__":
         print("Example: python scripts/test_phase2_send_transfer.py 999888777")
         sys.exit(1)
     
+    # Setup Django only once the arguments are valid
+    django.setup()
+
     citizen_id = sys.argv[1]
     test_send_transfer(citizen_id)
@@ -5,12 +5,10 @@ Run this after starting RabbitMQ and Django server.
 """
 import os
 import sys
-import django
 
-# Setup Django environment
-sys.path.insert(0, '/home/alejo/citizen-affiliation-service')
+# The publisher only reads settings, so skip django.setup() and the app registry
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
-django.setup()
 
 from affiliation.rabbitmq.publisher import publish_user_transferred
 
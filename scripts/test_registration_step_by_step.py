@@ -3,68 +3,127 @@
 Step-by-step registration test with detailed inspection at each stage.
 
 This script demonstrates and validates each step of the event-driven registration.
+Set REG_STEPS_VERBOSE=1 to also dump the payloads exchanged at each step.
 """
 import os
 import sys
 import django
 import json
 
-# Setup Django
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
-django.setup()
+from django.apps import apps
 
+# Setup Django, unless the importer (e.g. pytest) already did
+if not apps.ready:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    django.setup()
+
+from django.conf import settings
+from django.db import transaction
 from affiliation.services.citizen_service import CitizenService
-from affiliation.models import Citizen, Affiliation
+from affiliation.rabbitmq.register_citizen_consumer import handle_register_citizen_completed
+from affiliation.models import Citizen, OutboxEvent
+
+
+# register.citizen.completed fields that don't depend on the citizen
+# (Operator Connectivity reports MINTIC's HTTP status; 201 means registered)
+REGISTER_COMPLETED_SUCCESS = {'statusCode': 201}
+
+SEPARATOR = f"\n{'=' * 80}\n"
 
+VERBOSE = bool(os.environ.get('REG_STEPS_VERBOSE'))
 
-def print_separator(char='=', length=80):
+
+def print_separator():
     """Print a separator line."""
-    print(f"\n{char * length}\n")
+    print(SEPARATOR)
+
+
+def print_json(label, data):
+    """Dump a payload, only when REG_STEPS_VERBOSE is set."""
+    if VERBOSE:
+        print(f"{label}\n{json.dumps(data, indent=2)}")
 
 
 def print_step(step_num, title):
     """Print a step header."""
-    print_separator()
-    print(f"STEP {step_num}: {title}")
-    print_separator()
+    print(f"{SEPARATOR}\nSTEP {step_num}: {title}\n{SEPARATOR}")
+
+
+def verify_state(expected, actual):
+    """
+    Compare actual values against expected ones.
+
+    Prints a single line when everything matches, otherwise only the mismatches.
+
+    Returns:
+        bool: True if every value matched
+    """
+    diffs = {key: (actual[key], value) for key, value in expected.items() if actual[key] != value}
+
+    if not diffs:
+        print(f"   ✅ All {len(expected)} checks passed")
+        return True
+
+    for key, (got, want) in diffs.items():
+        print(f"   ❌ {key}: Expected {want}, got {got}")
+    return False
 
 
 def inspect_citizen(citizen_id):
     """Inspect and print citizen state."""
-    citizen = Citizen.objects.filter(citizen_id=citizen_id).first()
+    # Load the affiliation in the same query (reverse one-to-one join),
+    # selecting only the columns printed and checked below
+    citizen = (
+        Citizen.objects.select_related('affiliation')
+        .only(
+            'citizen_id', 'name', 'email', 'operator_name',
+            'is_registered', 'is_verified', 'verification_status',
+            'verification_message', 'pending_deletion',
+            'affiliation__status', 'affiliation__operator_name', 'affiliation__affiliated_at',
+        )
+        .filter(citizen_id=citizen_id)
+        .first()
+    )
     
     if not citizen:
         print(f"❌ Citizen {citizen_id} NOT FOUND in database")
         return None
     
-    print(f"\n📊 CITIZEN STATE:")
-    print(f"   ID: {citizen.citizen_id}")
-    print(f"   Name: {citizen.name}")
-    print(f"   Email: {citizen.email}")
-    print(f"   Operator: {citizen.operator_name}")
-    print(f"\n   🔐 Registration Status:")
-    print(f"   - is_registered: {citizen.is_registered}")
-    print(f"   - is_verified: {citizen.is_verified}")
-    print(f"   - verification_status: '{citizen.verification_status}'")
-    print(f"   - verification_message: '{citizen.verification_message}'")
-    print(f"   - pending_deletion: {citizen.pending_deletion}")
-    
-    # Check affiliation
-    affiliation = Affiliation.objects.filter(citizen=citizen).first()
+    # Collect the report and write it in one go
+    lines = [
+        f"\n📊 CITIZEN STATE:",
+        f"   ID: {citizen.citizen_id}",
+        f"   Name: {citizen.name}",
+        f"   Email: {citizen.email}",
+        f"   Operator: {citizen.operator_name}",
+        f"\n   🔐 Registration Status:",
+        f"   - is_registered: {citizen.is_registered}",
+        f"   - is_verified: {citizen.is_verified}",
+        f"   - verification_status: '{citizen.verification_status}'",
+        f"   - verification_message: '{citizen.verification_message}'",
+        f"   - pending_deletion: {citizen.pending_deletion}",
+    ]
+    
+    # Check affiliation (already loaded by select_related)
+    affiliation = getattr(citizen, 'affiliation', None)
     if affiliation:
-        print(f"\n   📋 Affiliation:")
-        print(f"   - status: '{affiliation.status}'")
-        print(f"   - operator: {affiliation.operator_name}")
-        print(f"   - affiliated_at: {affiliation.affiliated_at}")
+        lines += [
+            f"\n   📋 Affiliation:",
+            f"   - status: '{affiliation.status}'",
+            f"   - operator: {affiliation.operator_name}",
+            f"   - affiliated_at: {affiliation.affiliated_at}",
+        ]
     else:
-        print(f"\n   ⚠️  No affiliation found")
+        lines.append(f"\n   ⚠️  No affiliation found")
     
+    sys.stdout.write('\n'.join(lines) + '\n')
     return citizen
 
 
+@transaction.atomic
 def test_registration_steps():
-    """Test registration step by step."""
+    """Test registration step by step (in a single transaction)."""
     
     # Test data
     test_citizen_id = '1111222233'
@@ -77,11 +136,10 @@ def test_registration_steps():
         'operator_name': 'TEST DAGZ'
     }
     
-    # Clean up if exists
-    existing = Citizen.objects.filter(citizen_id=test_citizen_id).first()
-    if existing:
-        print(f"🧹 Cleaning up existing citizen {test_citizen_id}")
-        existing.delete()
+    # Clean up if exists (single DELETE, no SELECT first)
+    deleted, _ = Citizen.objects.filter(citizen_id=test_citizen_id).delete()
+    if deleted:
+        print(f"🧹 Cleaned up existing citizen {test_citizen_id}")
     
     service = CitizenService()
     
@@ -90,13 +148,11 @@ def test_registration_steps():
     # ============================================================================
     
     print("📝 Calling CitizenService.register_citizen()...")
-    print(f"\nInput data:")
-    print(json.dumps(test_data, indent=2))
+    print_json("\nInput data:", test_data)
     
     result = service.register_citizen(test_data)
     
-    print(f"\n✅ Service Response:")
-    print(json.dumps(result, indent=2))
+    print_json("\n✅ Service Response:", result)
     
     if not result['success']:
         print(f"\n❌ Registration failed: {result['message']}")
@@ -119,36 +175,23 @@ def test_registration_steps():
     
     print("✅ VALIDATING OPTIMISTIC UI PATTERN:")
     
-    checks = [
-        ("Citizen exists in database", citizen is not None, True),
-        ("is_registered = True", citizen.is_registered, True),
-        ("is_verified = False", citizen.is_verified, False),
-        ("verification_status = 'pending'", citizen.verification_status, 'pending'),
-        ("verification_message contains 'waiting'", 
-         'waiting' in citizen.verification_message.lower() if citizen.verification_message else False, True),
-        ("pending_deletion = False", citizen.pending_deletion, False),
-    ]
-    
-    all_passed = True
-    for check_name, actual, expected in checks:
-        if actual == expected:
-            print(f"   ✅ {check_name}: {actual}")
-        else:
-            print(f"   ❌ {check_name}: Expected {expected}, got {actual}")
-            all_passed = False
+    affiliation = getattr(citizen, 'affiliation', None)
     
-    affiliation = Affiliation.objects.filter(citizen=citizen).first()
-    if affiliation:
-        if affiliation.status == 'PENDING':
-            print(f"   ✅ Affiliation status = 'PENDING': {affiliation.status}")
-        else:
-            print(f"   ❌ Affiliation status should be 'PENDING', got '{affiliation.status}'")
-            all_passed = False
-    else:
-        print(f"   ❌ No affiliation created")
-        all_passed = False
-    
-    if all_passed:
+    expected = {
+        'is_registered': True,
+        'is_verified': False,
+        'verification_status': 'pending',
+        'pending_deletion': False,
+    }
+    actual = {field: getattr(citizen, field) for field in expected}
+    expected['verification_message contains waiting'] = True
+    actual['verification_message contains waiting'] = (
+        'waiting' in (citizen.verification_message or '').lower()
+    )
+    expected['affiliation.status'] = 'PENDING'
+    actual['affiliation.status'] = affiliation.status if affiliation else None
+    
+    if verify_state(expected, actual):
         print(f"\n🎉 OPTIMISTIC CREATION: PASSED")
     else:
         print(f"\n❌ OPTIMISTIC CREATION: FAILED")
@@ -158,13 +201,12 @@ def test_registration_steps():
     print_step(4, "CHECK API RESPONSE FORMAT")
     # ============================================================================
     
-    print("📡 What the UI/Frontend receives:")
-    print(json.dumps({
+    print_json("📡 What the UI/Frontend receives:", {
         "success": result['success'],
         "message": result['message'],
         "citizen_id": result.get('citizen_id'),
         "verification_status": result.get('verification_status')
-    }, indent=2))
+    })
     
     print(f"\n💡 UI CAN NOW:")
     print(f"   1. Show success message: '{result['message']}'")
@@ -176,17 +218,15 @@ def test_registration_steps():
     print_step(5, "CHECK RABBITMQ EVENT (Simulation)")
     # ============================================================================
     
-    print("📤 Event that was published to RabbitMQ:")
-    event_payload = {
-        'id': int(test_citizen_id),
-        'name': test_data['name'],
-        'address': test_data['address'],
-        'email': test_data['email'],
-        'operatorId': test_data['operator_id'],
-        'operatorName': test_data['operator_name']
-    }
-    print(f"Queue: 'register.citizen.requested'")
-    print(json.dumps(event_payload, indent=2))
+    print("📤 Event recorded in the outbox for RabbitMQ:")
+    # Show the payload the service actually stored instead of rebuilding it here
+    event = (
+        OutboxEvent.objects.filter(event_type=settings.RABBITMQ_REGISTER_CITIZEN_REQUESTED_QUEUE)
+        .order_by('-id')
+        .first()
+    )
+    print(f"Queue: '{settings.RABBITMQ_REGISTER_CITIZEN_REQUESTED_QUEUE}'")
+    print_json("Payload:", event.payload if event else None)
     
     print(f"\n💡 This event will be consumed by Operator Connectivity, which will:")
     print(f"   1. Call MINTIC API: POST /apis/registerCitizen")
@@ -202,21 +242,9 @@ def test_registration_steps():
     
     print(f"\n📥 Simulating 'register.citizen.completed' event reception...")
     
-    from affiliation.rabbitmq.register_citizen_consumer import handle_register_citizen_completed
-    
-    completion_event = {
-        'id': test_citizen_id,
-        'operatorId': test_data['operator_id'],
-        'success': True,
-        'message': 'Citizen registered successfully in MINTIC',
-        'response': {
-            'status': 'registered',
-            'timestamp': '2025-10-19T12:00:00Z'
-        }
-    }
+    completion_event = {'id': test_citizen_id, **REGISTER_COMPLETED_SUCCESS}
     
-    print(f"Event payload:")
-    print(json.dumps(completion_event, indent=2))
+    print_json("Event payload:", completion_event)
     
     print(f"\n🔄 Processing event...")
     handle_register_citizen_completed(completion_event)
@@ -226,8 +254,7 @@ def test_registration_steps():
     # ============================================================================
     
     print("🔍 Checking updated database state...")
-    citizen.refresh_from_db()
-    inspect_citizen(test_citizen_id)
+    citizen = inspect_citizen(test_citizen_id)
     
     # ============================================================================
     print_step(8, "VERIFY VERIFICATION COMPLETE")
@@ -235,25 +262,24 @@ def test_registration_steps():
     
     print("✅ VALIDATING POST-VERIFICATION STATE:")
     
-    affiliation.refresh_from_db()
+    affiliation = citizen.affiliation
     
-    checks = [
-        ("is_verified = True", citizen.is_verified, True),
-        ("verification_status = 'verified'", citizen.verification_status, 'verified'),
-        ("verification_message updated", 
-         'successfully' in citizen.verification_message.lower() if citizen.verification_message else False, True),
-        ("Affiliation status = 'AFFILIATED'", affiliation.status, 'AFFILIATED'),
-    ]
-    
-    all_passed = True
-    for check_name, actual, expected in checks:
-        if actual == expected:
-            print(f"   ✅ {check_name}: {actual}")
-        else:
-            print(f"   ❌ {check_name}: Expected {expected}, got {actual}")
-            all_passed = False
+    expected = {
+        'is_verified': True,
+        'verification_status': 'verified',
+        'verification_message updated': True,
+        'affiliation.status': 'AFFILIATED',
+    }
+    actual = {
+        'is_verified': citizen.is_verified,
+        'verification_status': citizen.verification_status,
+        'verification_message updated': (
+            'successfully' in (citizen.verification_message or '').lower()
+        ),
+        'affiliation.status': affiliation.status,
+    }
     
-    if all_passed:
+    if verify_state(expected, actual):
         print(f"\n🎉 VERIFICATION COMPLETE: PASSED")
     else:
         print(f"\n❌ VERIFICATION COMPLETE: FAILED")
@@ -2,120 +2,189 @@
 Pytest configuration and shared fixtures for the test suite.
 """
 
+import pika
 import pytest
-from unittest.mock import Mock, MagicMock
-from django.contrib.auth.models import User
+import responses
+from types import MappingProxyType, SimpleNamespace
+from pika.adapters.blocking_connection import BlockingChannel
+from unittest.mock import MagicMock, Mock
+from rest_framework.test import APIClient, APIRequestFactory
 from affiliation.models.citizen import Citizen
 from affiliation.models.affiliation import Affiliation
+from affiliation.services.citizen_service import CitizenService
+from affiliation.services.transfer_service import TransferService
 
 
-@pytest.fixture
-def mock_rabbitmq_publisher(mocker):
-    """Mock RabbitMQ publisher to avoid actual message publishing in tests."""
-    # Mock all the specific publisher functions
-    mock_affiliation_created = mocker.patch(
-        "affiliation.rabbitmq.publisher.publish_affiliation_created", return_value=True
-    )
-    mock_user_transferred = mocker.patch(
-        "affiliation.rabbitmq.publisher.publish_user_transferred", return_value=True
-    )
-    mock_documents_download = mocker.patch(
-        "affiliation.rabbitmq.publisher.publish_documents_download_requested", return_value=True
-    )
-    mock_register_requested = mocker.patch(
-        "affiliation.rabbitmq.publisher.publish_register_citizen_requested", return_value=True
-    )
-    mock_unregister_requested = mocker.patch(
-        "affiliation.rabbitmq.publisher.publish_unregister_citizen_requested", return_value=True
-    )
+@pytest.fixture(scope="session")
+def api_client():
+    """Shared DRF test client (the tests don't authenticate or keep cookies)."""
+    return APIClient()
+
 
-    return {
-        "affiliation_created": mock_affiliation_created,
-        "user_transferred": mock_user_transferred,
-        "documents_download": mock_documents_download,
-        "register_requested": mock_register_requested,
-        "unregister_requested": mock_unregister_requested,
-    }
+@pytest.fixture(scope="session")
+def api_request_factory():
+    """Request factory for calling views directly, skipping URL routing and middleware."""
+    return APIRequestFactory()
+
+
+@pytest.fixture(scope="session")
+def citizen_service():
+    """Shared CitizenService (it only holds the configured API base URL)."""
+    return CitizenService()
+
+
+@pytest.fixture(scope="session")
+def transfer_service():
+    """Shared TransferService (it keeps no per-instance state)."""
+    return TransferService()
 
 
 @pytest.fixture
-def mock_requests_get(mocker):
-    """Mock requests.get for external API calls."""
-    return mocker.patch("requests.get")
+def mocked_responses():
+    """
+    Route outgoing requests calls to registered fake responses.
+
+    Unregistered URLs raise ConnectionError, and registered responses are not
+    required to be used (some tests return before calling the API).
+    """
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        yield rsps
+
+
+@pytest.fixture(scope="session")
+def fake_response():
+    """
+    Factory fixture for stand-in requests responses.
+
+    Only status_code, text and json() are provided, which is all the services
+    read from a response.
+    """
+
+    def _fake_response(status_code=200, text="", body=None):
+        return SimpleNamespace(status_code=status_code, text=text, json=lambda: body)
+
+    return _fake_response
+
+
+@pytest.fixture(scope="session")
+def ok_response():
+    """Stand-in for a bare 200 response whose json() is an empty dict."""
+    return SimpleNamespace(status_code=200, text="", json=dict)
 
 
 @pytest.fixture
-def mock_requests_post(mocker):
-    """Mock requests.post for external API calls."""
-    return mocker.patch("requests.post")
+def mock_publisher(monkeypatch):
+    """Replace the RabbitMQPublisher class so no broker connection is attempted."""
+    publisher_class = MagicMock()
+    publisher_class.return_value.publish.return_value = True
+    publisher_class.return_value.publish_batch.return_value = True
+    monkeypatch.setattr("affiliation.rabbitmq.publisher.RabbitMQPublisher", publisher_class)
+    return publisher_class
 
 
 @pytest.fixture
+def mock_register_consumer_logger(monkeypatch):
+    """Capture what the register.citizen.completed consumer logs."""
+    logger = MagicMock()
+    monkeypatch.setattr("affiliation.rabbitmq.register_citizen_consumer.logger", logger)
+    return logger
+
+
+@pytest.fixture(scope="session")
 def sample_citizen_data():
     """Sample citizen data for testing."""
-    return {
-        "id": "1234567890",
-        "name": "John Doe",
-        "address": "Calle 123 #45-67",
-        "email": "john.doe@example.com",
-    }
+    return MappingProxyType(
+        {
+            "id": "1234567890",
+            "name": "John Doe",
+            "address": "Calle 123 #45-67",
+            "email": "john.doe@example.com",
+        }
+    )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_operator_data():
     """Sample operator data for testing."""
-    return {"operator_id": "507f1f77bcf86cd799439011", "operator_name": "Test Operator"}
+    return MappingProxyType(
+        {"operator_id": "507f1f77bcf86cd799439011", "operator_name": "Test Operator"}
+    )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_transfer_data(sample_citizen_data, sample_operator_data):
-    """Sample transfer data for incoming transfers."""
-    return {
-        "id": int(sample_citizen_data["id"]),
-        "citizenName": sample_citizen_data["name"],
-        "citizenEmail": sample_citizen_data["email"],
-        "urlDocuments": {
-            "document_id": "https://example.com/doc/123",
-            "document_rut": "https://example.com/doc/456",
-        },
-        "confirmAPI": "https://source-operator.com/api/confirm/",
-        "sourceOperatorId": sample_operator_data["operator_id"],
-        "sourceOperatorName": sample_operator_data["operator_name"],
-    }
+    """
+    Sample transfer data for incoming transfers.
+
+    urlDocuments stays a plain dict because it is stored in an outbox JSON payload.
+    """
+    return MappingProxyType(
+        {
+            "id": int(sample_citizen_data["id"]),
+            "citizenName": sample_citizen_data["name"],
+            "citizenEmail": sample_citizen_data["email"],
+            "urlDocuments": {
+                "document_id": "https://example.com/doc/123",
+                "document_rut": "https://example.com/doc/456",
+            },
+            "confirmAPI": "https://source-operator.com/api/confirm/",
+            "sourceOperatorId": sample_operator_data["operator_id"],
+            "sourceOperatorName": sample_operator_data["operator_name"],
+        }
+    )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_target_operator():
     """Sample target operator for outgoing transfers."""
-    return {
-        "targetOperatorId": "target_operator_999",
-        "targetOperatorName": "Target Operator ABC",
-        "targetApiUrl": "https://target-operator.com/api/transfer/receive/",
-    }
+    return MappingProxyType(
+        {
+            "targetOperatorId": "target_operator_999",
+            "targetOperatorName": "Target Operator ABC",
+            "targetApiUrl": "https://target-operator.com/api/transfer/receive/",
+        }
+    )
 
 
 @pytest.fixture
 @pytest.mark.django_db
 def create_citizen(db, sample_citizen_data, sample_operator_data):
-    """Factory fixture to create a test citizen."""
+    """
+    Factory fixture to create a test citizen.
 
-    def _create_citizen(**kwargs):
+    Pass n to insert that many citizens with a single bulk_create and get a
+    list back; with n > 1 each citizen_id gets an index suffix. bulk_create
+    does not send post_save, so no affiliation.created outbox events are
+    recorded.
+    """
+
+    def _create_citizen(n=None, **kwargs):
         citizen_data = {**sample_citizen_data, **sample_operator_data, **kwargs}
         # Map 'id' to 'citizen_id'
         if "id" in citizen_data and "citizen_id" not in citizen_data:
             citizen_data["citizen_id"] = citizen_data.pop("id")
 
-        citizen = Citizen.objects.create(
-            citizen_id=citizen_data["citizen_id"],
-            name=citizen_data["name"],
-            address=citizen_data.get("address", "Default Address"),
-            email=citizen_data["email"],
-            operator_id=citizen_data["operator_id"],
-            operator_name=citizen_data["operator_name"],
-            is_registered=citizen_data.get("is_registered", True),
-            is_verified=citizen_data.get("is_verified", False),
-            verification_status=citizen_data.get("verification_status", "pending"),
-        )
+        def _build(citizen_id):
+            return Citizen(
+                citizen_id=citizen_id,
+                name=citizen_data["name"],
+                address=citizen_data.get("address", "Default Address"),
+                email=citizen_data["email"],
+                operator_id=citizen_data["operator_id"],
+                operator_name=citizen_data["operator_name"],
+                is_registered=citizen_data.get("is_registered", True),
+                is_verified=citizen_data.get("is_verified", False),
+                verification_status=citizen_data.get("verification_status", "pending"),
+            )
+
+        if n == 1:
+            return Citizen.objects.bulk_create([_build(citizen_data["citizen_id"])])
+        if n:
+            citizens = [_build(f"{citizen_data['citizen_id']}{i}") for i in range(n)]
+            return Citizen.objects.bulk_create(citizens, batch_size=500)
+
+        citizen = _build(citizen_data["citizen_id"])
+        citizen.save()
         return citizen
 
     return _create_citizen
@@ -124,35 +193,71 @@ def create_citizen(db, sample_citizen_data, sample_operator_data):
 @pytest.fixture
 @pytest.mark.django_db
 def create_affiliation(db, sample_operator_data):
-    """Factory fixture to create a test affiliation."""
+    """
+    Factory fixture to create a test affiliation.
+
+    Pass a list of citizens to create one affiliation each with a single
+    bulk_create; a list is returned.
+    """
 
     def _create_affiliation(citizen, **kwargs):
         affiliation_data = {**sample_operator_data, **kwargs}
-        affiliation = Affiliation.objects.create(
-            citizen=citizen,
-            operator_id=affiliation_data.get("operator_id"),
-            operator_name=affiliation_data.get("operator_name"),
-            status=affiliation_data.get("status", "AFFILIATED"),
-            transfer_destination_operator_id=affiliation_data.get(
-                "transfer_destination_operator_id"
-            ),
-            transfer_destination_operator_name=affiliation_data.get(
-                "transfer_destination_operator_name"
-            ),
-            transfer_destination_api_url=affiliation_data.get("transfer_destination_api_url"),
-            transfer_started_at=affiliation_data.get("transfer_started_at"),
-        )
+
+        def _build(citizen):
+            return Affiliation(
+                citizen=citizen,
+                operator_id=affiliation_data.get("operator_id"),
+                operator_name=affiliation_data.get("operator_name"),
+                status=affiliation_data.get("status", "AFFILIATED"),
+                transfer_destination_operator_id=affiliation_data.get(
+                    "transfer_destination_operator_id"
+                ),
+                transfer_destination_operator_name=affiliation_data.get(
+                    "transfer_destination_operator_name"
+                ),
+                transfer_destination_api_url=affiliation_data.get("transfer_destination_api_url"),
+                transfer_started_at=affiliation_data.get("transfer_started_at"),
+                transfer_confirmation_url=affiliation_data.get("transfer_confirmation_url"),
+                documents_ready=affiliation_data.get("documents_ready", False),
+            )
+
+        if isinstance(citizen, list):
+            return Affiliation.objects.bulk_create(
+                [_build(each) for each in citizen], batch_size=500
+            )
+
+        affiliation = _build(citizen)
+        affiliation.save()
         return affiliation
 
     return _create_affiliation
 
 
+@pytest.fixture(scope="session")
+def citizen_snapshot():
+    """
+    Read a citizen's verification fields and affiliation status with one joined query.
+
+    Returns a dict (affiliation status under "affiliation__status"), or None if
+    the citizen doesn't exist.
+    """
+
+    def _citizen_snapshot(citizen_id):
+        return (
+            Citizen.objects.filter(citizen_id=citizen_id)
+            .values("is_verified", "verification_status", "affiliation__status")
+            .first()
+        )
+
+    return _citizen_snapshot
+
+
 @pytest.fixture
 @pytest.mark.django_db
 def affiliated_citizen(create_citizen, create_affiliation):
     """Create a fully affiliated citizen for testing."""
-    citizen = create_citizen(is_verified=True, verification_status="verified")
-    affiliation = create_affiliation(citizen)
+    [citizen] = create_citizen(n=1, is_verified=True, verification_status="verified")
+    [affiliation] = create_affiliation([citizen])
     return citizen, affiliation
 
 
@@ -160,9 +265,9 @@ def affiliated_citizen(create_citizen, create_affiliation):
 @pytest.mark.django_db
 def transferring_citizen(create_citizen, create_affiliation):
     """Create a citizen in TRANSFERRING state for testing."""
-    citizen = create_citizen(is_verified=True, verification_status="verified")
-    affiliation = create_affiliation(
-        citizen,
+    [citizen] = create_citizen(n=1, is_verified=True, verification_status="verified")
+    [affiliation] = create_affiliation(
+        [citizen],
         status="TRANSFERRING",
         transfer_destination_operator_id="target_999",
         transfer_destination_operator_name="Target Operator",
@@ -171,57 +276,12 @@ def transferring_citizen(create_citizen, create_affiliation):
     return citizen, affiliation
 
 
-@pytest.fixture
-def mock_mintic_validation_success(mock_requests_get):
-    """Mock successful MINTIC citizen validation."""
-    mock_response = Mock()
-    mock_response.status_code = 200
-    mock_response.text = "El ciudadano con id: 1234567890 se encuentra registrado"
-    mock_requests_get.return_value = mock_response
-    return mock_requests_get
-
-
-@pytest.fixture
-def mock_mintic_validation_not_found(mock_requests_get):
-    """Mock MINTIC citizen not found."""
-    mock_response = Mock()
-    mock_response.status_code = 404
-    mock_response.text = "Ciudadano no encontrado"
-    mock_requests_get.return_value = mock_response
-    return mock_requests_get
-
-
-@pytest.fixture
-def mock_document_service_success(mock_requests_get):
-    """Mock successful document service response."""
-    mock_response = Mock()
-    mock_response.status_code = 200
-    mock_response.json.return_value = {
-        "document_id": "https://storage.example.com/docs/id_123.pdf",
-        "document_rut": "https://storage.example.com/docs/rut_123.pdf",
-    }
-    mock_requests_get.return_value = mock_response
-    return mock_requests_get
-
-
-@pytest.fixture
-def mock_external_operator_success(mock_requests_post):
-    """Mock successful external operator API response."""
-    mock_response = Mock()
-    mock_response.status_code = 200
-    mock_response.json.return_value = {
-        "message": "Transfer received successfully",
-        "citizenId": "1234567890",
-    }
-    mock_requests_post.return_value = mock_response
-    return mock_requests_post
-
-
 @pytest.fixture
 def mock_pika_connection(mocker):
     """Mock pika RabbitMQ connection."""
-    mock_connection = MagicMock()
-    mock_channel = MagicMock()
+    # Spec'd mocks reject attributes pika doesn't have
+    mock_connection = Mock(spec=pika.BlockingConnection)
+    mock_channel = Mock(spec=BlockingChannel)
     mock_connection.channel.return_value = mock_channel
 
     mocker.patch("pika.BlockingConnection", return_value=mock_connection)
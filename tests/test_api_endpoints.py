@@ -3,37 +3,43 @@ API endpoint tests for citizen affiliation service.
 """
 
 import pytest
-import json
 from django.urls import reverse
-from rest_framework.test import APIClient
 from rest_framework import status
 from unittest.mock import patch
 from affiliation.models.citizen import Citizen
 from affiliation.models.affiliation import Affiliation
+from affiliation.api.views import AffiliationStatusView, OperatorsListView, ValidateCitizenView
+
+REGISTER_URL = reverse("register-citizen")
+TRANSFER_RECEIVE_URL = reverse("transfer-receive")
+TRANSFER_CONFIRM_URL = reverse("transfer-confirm")
+OPERATORS_URL = reverse("operators-list")
+HEALTH_URL = reverse("health_check")
+
+# Views called directly (no URL resolution or middleware) by tests that only
+# exercise the handler
+validate_citizen_view = ValidateCitizenView.as_view()
+affiliation_status_view = AffiliationStatusView.as_view()
+operators_list_view = OperatorsListView.as_view()
 
 
 @pytest.mark.django_db
 class TestCitizenRegistrationAPI:
     """Test cases for citizen registration endpoint."""
 
-    def setup_method(self):
-        """Set up test client."""
-        self.client = APIClient()
-        self.url = reverse("register-citizen")
+    @pytest.fixture(autouse=True)
+    def _mock_external(self, monkeypatch, fake_response):
+        """MINTIC doesn't know the citizen, unless a test overrides it."""
+        monkeypatch.setattr(
+            "affiliation.services.citizen_service.requests.get",
+            lambda *args, **kwargs: fake_response(404),
+        )
 
-    @patch("affiliation.rabbitmq.publisher.publish_register_citizen_requested")
-    @patch("affiliation.services.citizen_service.requests.get")
-    def test_register_citizen_success(
-        self, mock_get, mock_publish, sample_citizen_data, sample_operator_data
-    ):
+    def test_register_citizen_success(self, sample_citizen_data, sample_operator_data, api_client):
         """Test successful citizen registration via API."""
-        # Mock validation to return citizen doesn't exist
-        mock_get.return_value.status_code = 404
-        mock_publish.return_value = True
-
         data = {**sample_citizen_data, **sample_operator_data}
 
-        response = self.client.post(self.url, data, format="json")
+        response = api_client.post(REGISTER_URL, data, format="json")
 
         assert response.status_code == status.HTTP_201_CREATED
         assert "message" in response.data
@@ -41,7 +47,7 @@ class TestCitizenRegistrationAPI:
         # Verify citizen was created with correct field name
         assert Citizen.objects.filter(citizen_id=sample_citizen_data["id"]).exists()
 
-    def test_register_citizen_missing_fields(self):
+    def test_register_citizen_missing_fields(self, api_client):
         """Test registration with missing required fields."""
         data = {
             "id": "1234567890",
@@ -49,94 +55,69 @@ class TestCitizenRegistrationAPI:
             # Missing email, address, operator_id
         }
 
-        response = self.client.post(self.url, data, format="json")
+        response = api_client.post(REGISTER_URL, data, format="json")
 
         assert response.status_code in [
             status.HTTP_400_BAD_REQUEST,
             status.HTTP_422_UNPROCESSABLE_ENTITY,
         ]
 
-    @patch("affiliation.rabbitmq.publisher.publish_register_citizen_requested")
-    @patch("affiliation.services.citizen_service.requests.get")
-    def test_register_citizen_duplicate(
-        self, mock_get, mock_publish, create_citizen, sample_citizen_data, sample_operator_data
-    ):
-        """Test registering duplicate citizen."""
-        # Create existing citizen with verified status
-        create_citizen(
-            citizen_id=sample_citizen_data["id"], is_verified=True, verification_status="verified"
-        )
-
-        # Mock validation
-        mock_get.return_value.status_code = 404
-        mock_publish.return_value = True
 
-        data = {**sample_citizen_data, **sample_operator_data}
-        response = self.client.post(self.url, data, format="json")
-
-        assert response.status_code == status.HTTP_400_BAD_REQUEST
-
-
-@pytest.mark.django_db
 class TestCitizenValidationAPI:
     """Test cases for citizen validation endpoint."""
 
-    def setup_method(self):
-        """Set up test client."""
-        self.client = APIClient()
-
     @patch("affiliation.services.citizen_service.requests.get")
-    def test_validate_citizen_exists(self, mock_get):
+    def test_validate_citizen_exists(self, mock_get, api_request_factory, fake_response):
         """Test validating existing citizen."""
         citizen_id = "1234567890"
         url = reverse("validate-citizen", kwargs={"citizen_id": citizen_id})
 
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.text = "El ciudadano se encuentra registrado"
+        mock_get.return_value = fake_response(200, "El ciudadano se encuentra registrado")
 
-        response = self.client.get(url)
+        response = validate_citizen_view(api_request_factory.get(url), citizen_id=citizen_id)
 
         assert response.status_code == status.HTTP_200_OK
         assert "message" in response.data
 
     @patch("affiliation.services.citizen_service.requests.get")
-    def test_validate_citizen_not_found(self, mock_get):
+    def test_validate_citizen_not_found(self, mock_get, api_request_factory, fake_response):
         """Test validating non-existent citizen."""
         citizen_id = "9999999999"
         url = reverse("validate-citizen", kwargs={"citizen_id": citizen_id})
 
-        mock_get.return_value.status_code = 404
+        mock_get.return_value = fake_response(404)
 
-        response = self.client.get(url)
+        response = validate_citizen_view(api_request_factory.get(url), citizen_id=citizen_id)
 
         assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
-@pytest.mark.django_db
 class TestAffiliationStatusAPI:
     """Test cases for affiliation status endpoint."""
 
-    def setup_method(self):
-        """Set up test client."""
-        self.client = APIClient()
-
-    def test_get_affiliation_status_success(self, affiliated_citizen):
+    @pytest.mark.django_db
+    def test_get_affiliation_status_success(self, affiliated_citizen, api_request_factory):
         """Test getting affiliation status."""
         citizen, affiliation = affiliated_citizen
         url = reverse("affiliation-status", kwargs={"citizen_id": citizen.citizen_id})
 
-        response = self.client.get(url)
+        response = affiliation_status_view(
+            api_request_factory.get(url), citizen_id=citizen.citizen_id
+        )
 
         assert response.status_code == status.HTTP_200_OK
         assert response.data["citizen_id"] == citizen.citizen_id
         assert response.data["status"] == "AFFILIATED"
         assert response.data["operator_id"] == affiliation.operator_id
 
-    def test_get_affiliation_status_not_found(self):
+    @patch.object(Citizen, "objects")
+    def test_get_affiliation_status_not_found(self, mock_objects, api_request_factory):
         """Test getting status for non-existent citizen."""
+        # The lookup finds nothing, without touching the database
+        mock_objects.filter.return_value.select_related.return_value.first.return_value = None
         url = reverse("affiliation-status", kwargs={"citizen_id": "9999999999"})
 
-        response = self.client.get(url)
+        response = affiliation_status_view(api_request_factory.get(url), citizen_id="9999999999")
 
         assert response.status_code == status.HTTP_404_NOT_FOUND
 
@@ -145,37 +126,31 @@ class TestAffiliationStatusAPI:
 class TestTransferSendAPI:
     """Test cases for sending transfer endpoint."""
 
-    def setup_method(self):
-        """Set up test client."""
-        self.client = APIClient()
-
-    @patch("affiliation.rabbitmq.publisher.publish_unregister_citizen_requested")
-    def test_send_transfer_success(self, mock_publish, affiliated_citizen, sample_target_operator):
+    def test_send_transfer_success(self, affiliated_citizen, sample_target_operator, api_client):
         """Test initiating outgoing transfer."""
         citizen, affiliation = affiliated_citizen
         url = reverse("transfer-send", kwargs={"citizen_id": citizen.citizen_id})
 
-        mock_publish.return_value = True
-        response = self.client.post(url, sample_target_operator, format="json")
+        response = api_client.post(url, sample_target_operator, format="json")
 
         assert response.status_code == status.HTTP_200_OK
         assert "message" in response.data
 
         # Verify affiliation status changed
-        affiliation.refresh_from_db()
-        assert affiliation.status == "TRANSFERRING"
+        assert (
+            Affiliation.objects.values_list("status", flat=True).get(pk=affiliation.pk)
+            == "TRANSFERRING"
+        )
 
-    @patch("affiliation.rabbitmq.publisher.publish_unregister_citizen_requested")
-    def test_send_transfer_citizen_not_found(self, mock_publish, sample_target_operator):
+    def test_send_transfer_citizen_not_found(self, sample_target_operator, api_client):
         """Test transfer for non-existent citizen."""
-        mock_publish.return_value = True
         url = reverse("transfer-send", kwargs={"citizen_id": "9999999999"})
 
-        response = self.client.post(url, sample_target_operator, format="json")
+        response = api_client.post(url, sample_target_operator, format="json")
 
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
-    def test_send_transfer_missing_fields(self, affiliated_citizen):
+    def test_send_transfer_missing_fields(self, affiliated_citizen, api_client):
         """Test transfer with missing required fields."""
         citizen, _ = affiliated_citizen
         url = reverse("transfer-send", kwargs={"citizen_id": citizen.citizen_id})
@@ -185,7 +160,7 @@ class TestTransferSendAPI:
             # Missing targetOperatorName and targetApiUrl
         }
 
-        response = self.client.post(url, data, format="json")
+        response = api_client.post(url, data, format="json")
 
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
@@ -194,36 +169,51 @@ class TestTransferSendAPI:
 class TestTransferReceiveAPI:
     """Test cases for receiving transfer endpoint."""
 
-    def setup_method(self):
-        """Set up test client."""
-        self.client = APIClient()
-        self.url = reverse("transfer-receive")
-
-    @patch("affiliation.rabbitmq.publisher.publish_register_citizen_requested")
-    def test_receive_transfer_success(self, mock_publish, sample_transfer_data):
+    def test_receive_transfer_success(self, sample_transfer_data, api_client):
         """Test receiving incoming transfer."""
-        mock_publish.return_value = True
-        response = self.client.post(self.url, sample_transfer_data, format="json")
+        response = api_client.post(TRANSFER_RECEIVE_URL, sample_transfer_data, format="json")
 
         assert response.status_code == status.HTTP_201_CREATED
 
-        # Verify citizen was created with correct field name
+        # Verify citizen and affiliation were created with the callback URL (one joined query)
         citizen_id = str(sample_transfer_data["id"])
-        assert Citizen.objects.filter(citizen_id=citizen_id).exists()
+        confirmation_url = Affiliation.objects.values_list(
+            "transfer_confirmation_url", flat=True
+        ).get(citizen__citizen_id=citizen_id)
+        assert confirmation_url == sample_transfer_data["confirmAPI"]
 
-        # Verify affiliation was created with callback URL
-        citizen = Citizen.objects.get(citizen_id=citizen_id)
-        affiliation = Affiliation.objects.get(citizen=citizen)
-        assert affiliation.transfer_confirmation_url == sample_transfer_data["confirmAPI"]
 
-    @patch("affiliation.rabbitmq.publisher.publish_register_citizen_requested")
-    def test_receive_transfer_duplicate(self, mock_publish, create_citizen, sample_transfer_data):
-        """Test receiving transfer for existing citizen."""
+@pytest.mark.django_db
+class TestDuplicateCitizenAPI:
+    """Test that endpoints creating a citizen reject one that is already registered."""
+
+    @pytest.mark.parametrize(
+        "url",
+        [
+            pytest.param(REGISTER_URL, id="register"),
+            pytest.param(TRANSFER_RECEIVE_URL, id="transfer_receive"),
+        ],
+    )
+    def test_existing_verified_citizen_is_rejected(
+        self,
+        url,
+        create_citizen,
+        sample_citizen_data,
+        sample_operator_data,
+        sample_transfer_data,
+        api_client,
+    ):
+        """Test registering or receiving a citizen that already exists and is verified."""
+        payloads = {
+            REGISTER_URL: {**sample_citizen_data, **sample_operator_data},
+            TRANSFER_RECEIVE_URL: sample_transfer_data,
+        }
         # Create existing citizen with verified status
-        create_citizen(citizen_id=str(sample_transfer_data["id"]), is_verified=True)
-        mock_publish.return_value = True
+        create_citizen(
+            citizen_id=sample_citizen_data["id"], is_verified=True, verification_status="verified"
+        )
 
-        response = self.client.post(self.url, sample_transfer_data, format="json")
+        response = api_client.post(url, payloads[url], format="json")
 
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
@@ -232,20 +222,13 @@ class TestTransferReceiveAPI:
 class TestTransferConfirmAPI:
     """Test cases for transfer confirmation endpoint."""
 
-    def setup_method(self):
-        """Set up test client."""
-        self.client = APIClient()
-        self.url = reverse("transfer-confirm")
-
-    @patch("affiliation.rabbitmq.publisher.publish_user_transferred")
-    def test_confirm_transfer_success(self, mock_publish, transferring_citizen):
+    def test_confirm_transfer_success(self, transferring_citizen, api_client):
         """Test successful transfer confirmation."""
         citizen, affiliation = transferring_citizen
-        mock_publish.return_value = True
 
         data = {"id": citizen.citizen_id, "req_status": 1}  # Success
 
-        response = self.client.post(self.url, data, format="json")
+        response = api_client.post(TRANSFER_CONFIRM_URL, data, format="json")
 
         assert response.status_code == status.HTTP_200_OK
         assert "message" in response.data
@@ -253,15 +236,13 @@ class TestTransferConfirmAPI:
         # Verify citizen was deleted
         assert not Citizen.objects.filter(citizen_id=citizen.citizen_id).exists()
 
-    @patch("affiliation.rabbitmq.publisher.publish_user_transferred")
-    def test_confirm_transfer_failure(self, mock_publish, transferring_citizen):
+    def test_confirm_transfer_failure(self, transferring_citizen, api_client):
         """Test failed transfer confirmation."""
         citizen, affiliation = transferring_citizen
-        mock_publish.return_value = True
 
         data = {"id": citizen.citizen_id, "req_status": 0}  # Failure
 
-        response = self.client.post(self.url, data, format="json")
+        response = api_client.post(TRANSFER_CONFIRM_URL, data, format="json")
 
         # Service returns 400 for failed confirmation
         assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -270,75 +251,92 @@ class TestTransferConfirmAPI:
         assert Citizen.objects.filter(citizen_id=citizen.citizen_id).exists()
 
         # Verify affiliation rolled back
-        affiliation.refresh_from_db()
-        assert affiliation.status == "AFFILIATED"
+        assert (
+            Affiliation.objects.values_list("status", flat=True).get(pk=affiliation.pk)
+            == "AFFILIATED"
+        )
 
-    def test_confirm_transfer_citizen_not_found(self):
+    def test_confirm_transfer_citizen_not_found(self, api_client):
         """Test confirmation for non-existent citizen."""
         data = {"id": "9999999999", "req_status": 1}
 
-        response = self.client.post(self.url, data, format="json")
+        response = api_client.post(TRANSFER_CONFIRM_URL, data, format="json")
 
         # Service returns 400 for unknown citizen
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
 
-@pytest.mark.django_db
 class TestDeleteAffiliationAPI:
     """Test cases for delete affiliation endpoint."""
 
-    def setup_method(self):
-        """Set up test client."""
-        self.client = APIClient()
-
-    @patch("affiliation.rabbitmq.publisher.publish_unregister_citizen_requested")
-    @patch("affiliation.rabbitmq.publisher.publish_user_transferred")
-    def test_delete_affiliation_success(
-        self, mock_transferred, mock_unregister, affiliated_citizen
-    ):
+    @pytest.mark.django_db
+    def test_delete_affiliation_success(self, affiliated_citizen, api_client):
         """Test successful affiliation deletion."""
         citizen, affiliation = affiliated_citizen
         url = reverse("affiliation-delete", kwargs={"citizen_id": citizen.citizen_id})
         citizen_id = citizen.citizen_id
 
-        mock_transferred.return_value = True
-        mock_unregister.return_value = True
-
-        response = self.client.delete(url)
+        response = api_client.delete(url)
 
         assert response.status_code == status.HTTP_200_OK
 
         # Citizen should be marked for deletion, not immediately deleted
         # (actual deletion happens after unregister event confirmation)
 
-    def test_delete_affiliation_not_found(self):
+    @patch.object(Citizen, "objects")
+    def test_delete_affiliation_not_found(self, mock_objects, api_client):
         """Test deleting non-existent affiliation."""
+        # The lookup finds nothing, without touching the database
+        mock_objects.filter.return_value.select_related.return_value.first.return_value = None
         url = reverse("affiliation-delete", kwargs={"citizen_id": "9999999999"})
 
-        response = self.client.delete(url)
+        response = api_client.delete(url)
 
         assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
-@pytest.mark.django_db
 class TestOperatorsListAPI:
     """Test cases for operators list endpoint."""
 
-    def setup_method(self):
-        """Set up test client."""
-        self.client = APIClient()
-        self.url = reverse("operators-list")
-
     @patch("affiliation.services.citizen_service.requests.get")
-    def test_get_operators_success(self, mock_get):
+    def test_get_operators_success(self, mock_get, api_request_factory, fake_response):
         """Test getting operators list."""
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = [
-            {"id": "op1", "name": "Operator 1"},
-            {"id": "op2", "name": "Operator 2"},
-        ]
+        mock_get.return_value = fake_response(
+            body=[{"id": "op1", "name": "Operator 1"}, {"id": "op2", "name": "Operator 2"}]
+        )
 
-        response = self.client.get(self.url)
+        response = operators_list_view(api_request_factory.get(OPERATORS_URL))
 
         assert response.status_code == status.HTTP_200_OK
         assert len(response.data["operators"]) == 2
+
+
+@pytest.mark.django_db
+class TestHealthCheckAPI:
+    """Test cases for the Kubernetes health check endpoint."""
+
+    @patch("affiliation.api.health._database_checked_at", 0.0)
+    @patch("affiliation.api.health.time.monotonic")
+    @patch("affiliation.api.health.connection")
+    def test_database_check_is_cached_between_probes(
+        self, mock_connection, mock_monotonic, api_client
+    ):
+        """Test probes within the TTL reuse the last successful database check."""
+        mock_monotonic.side_effect = [1000.0, 1000.0, 1001.0, 1010.0, 1010.0]
+
+        for _ in range(3):
+            response = api_client.get(HEALTH_URL)
+            assert response.status_code == status.HTTP_200_OK
+
+        assert mock_connection.ensure_connection.call_count == 2
+
+    @patch("affiliation.api.health._database_checked_at", 0.0)
+    @patch("affiliation.api.health.connection")
+    def test_database_failure_returns_503(self, mock_connection, api_client):
+        """Test an unreachable database marks the service unhealthy."""
+        mock_connection.ensure_connection.side_effect = Exception("connection refused")
+
+        response = api_client.get(HEALTH_URL)
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.json()["checks"]["database"] == "error"
@@ -4,8 +4,7 @@ These tests focus on increasing coverage numbers by testing previously untested
 """
 
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-from django.test import RequestFactory
+from unittest.mock import patch, MagicMock
 from affiliation.models import Citizen, Affiliation
 from affiliation.services.citizen_service import CitizenService
 from affiliation.services.transfer_service import TransferService
@@ -15,20 +14,15 @@ from affiliation.services.transfer_service import TransferService
 class TestCitizenServiceCoverage:
     """Additional tests for CitizenService to increase coverage."""
 
-    def setup_method(self):
-        self.service = CitizenService()
-
     def test_create_affiliation_success(self, db, mocker):
         """Test successful citizen registration."""
-        mock_validate = mocker.patch.object(
-            CitizenService, "validate_citizen", return_value={"exists": False}
-        )
-        mock_publish = mocker.patch(
-            "affiliation.services.citizen_service.publish_register_citizen_requested",
-            return_value=True,
+        mock_enqueue = mocker.patch(
+            "affiliation.services.citizen_service.enqueue_register_citizen_requested"
         )
 
+        # Override on a fresh instance; the session citizen_service is shared
         service = CitizenService()
+        service.validate_citizen = MagicMock(return_value={"exists": False})
         citizen_data = {
             "citizen_id": "1234567890",
             "name": "Test Citizen",
@@ -40,16 +34,14 @@ class TestCitizenServiceCoverage:
         result = service.register_citizen(citizen_data)
 
         assert result["success"] is True
+        service.validate_citizen.assert_called_once_with("1234567890")
 
-    def test_create_affiliation_not_found(self, db, mocker):
+    def test_create_affiliation_not_found(self, db):
         """Test citizen registration when validation fails."""
-        mock_validate = mocker.patch.object(
-            CitizenService,
-            "validate_citizen",
-            return_value={"exists": True, "message": "Already exists"},
-        )
-
         service = CitizenService()
+        service.validate_citizen = MagicMock(
+            return_value={"exists": True, "message": "Already exists"}
+        )
         citizen_data = {
             "citizen_id": "9999999999",
             "name": "Test Citizen",
@@ -61,10 +53,11 @@ class TestCitizenServiceCoverage:
         result = service.register_citizen(citizen_data)
 
         assert result["success"] is False
+        service.validate_citizen.assert_called_once_with("9999999999")
 
-    def test_delete_affiliation_citizen_not_found(self):
+    def test_delete_affiliation_citizen_not_found(self, citizen_service):
         """Test deleting affiliation for non-existent citizen."""
-        result = self.service.delete_affiliation("9999999999")
+        result = citizen_service.delete_affiliation("9999999999")
         assert result["success"] is False
 
 
@@ -72,12 +65,9 @@ class TestCitizenServiceCoverage:
 class TestTransferServiceCoverage:
     """Additional tests for TransferService to increase coverage."""
 
-    def setup_method(self):
-        self.service = TransferService()
-
-    def test_receive_transfer_minimal_data(self):
+    def test_receive_transfer_minimal_data(self, transfer_service):
         """Test receiving transfer with minimal valid data."""
-        result = self.service.receive_transfer(
+        result = transfer_service.receive_transfer(
             {
                 "id": 123456,
                 "citizenName": "Test",
@@ -91,43 +81,30 @@ class TestTransferServiceCoverage:
         # Should succeed or fail gracefully
         assert "success" in result
 
-    def test_continue_transfer_citizen_not_found(self):
+    def test_continue_transfer_citizen_not_found(self, transfer_service):
         """Test continuing transfer for non-existent citizen."""
-        result = self.service.continue_transfer_after_unregister("9999999999")
+        result = transfer_service.continue_transfer_after_unregister("9999999999")
         assert result["success"] is False
 
-    def test_handle_transfer_confirmation_not_found(self):
+    def test_handle_transfer_confirmation_not_found(self, transfer_service):
         """Test confirmation for non-existent citizen."""
-        result = self.service.handle_transfer_confirmation("9999999999", req_status=1)
+        result = transfer_service.handle_transfer_confirmation("9999999999", req_status=1)
         assert result["success"] is False
 
     @patch("affiliation.services.transfer_service.requests.post")
-    def test_complete_transfer_after_documents_no_url(self, mock_post):
+    def test_complete_transfer_after_documents_no_url(
+        self, mock_post, transfer_service, create_citizen, create_affiliation
+    ):
         """Test completing transfer with no callback URL."""
         # Create a citizen without callback URL
-        citizen = Citizen.objects.create(
-            citizen_id="8888888888",
-            name="Test",
-            email="test@test.com",
-            address="Test",
-            operator_id="OP1",
-            operator_name="Test Op",
-            is_registered=True,
-        )
-        affiliation = Affiliation.objects.create(
-            citizen=citizen,
-            operator_id="OP1",
-            operator_name="Test Op",
-            status="TRANSFERRING",
-            transfer_confirmation_url=None,
-        )
+        [citizen] = create_citizen(n=1, citizen_id="8888888888")
+        create_affiliation([citizen], status="TRANSFERRING", transfer_confirmation_url=None)
 
-        result = self.service.complete_transfer_after_documents(citizen.citizen_id)
+        result = transfer_service.complete_transfer_after_documents(citizen.citizen_id)
         # Should handle gracefully
         assert result is not None
 
 
-@pytest.mark.django_db
 class TestAPIViewsCoverage:
     """Test API views for coverage."""
 
@@ -144,12 +121,10 @@ class TestAPIViewsCoverage:
         assert hasattr(serializers, "CitizenSerializer")
 
 
-@pytest.mark.django_db
 class TestConsumersCoverage:
     """Test consumer functions for coverage."""
 
-    @patch("affiliation.rabbitmq.register_citizen_consumer.logger")
-    def test_register_consumer_import(self, mock_logger):
+    def test_register_consumer_import(self, mock_register_consumer_logger):
         """Test register consumer can be imported."""
         from affiliation.rabbitmq import register_citizen_consumer
 
@@ -168,13 +143,10 @@ class TestConsumersCoverage:
 
         assert hasattr(documents_ready_consumer, "handle_documents_ready")
 
-    def test_documents_ready_missing_id(self):
-        """Test documents ready handler with missing citizen ID."""
-        from affiliation.rabbitmq.documents_ready_consumer import handle_documents_ready
 
-        result = handle_documents_ready({})
-        # Should handle missing ID gracefully
-        assert result is None or isinstance(result, dict)
+@pytest.mark.django_db
+class TestDocumentsReadyCoverage:
+    """Test the documents.ready handler's lookups for coverage."""
 
     def test_documents_ready_citizen_not_found(self):
         """Test documents ready for non-existent citizen."""
@@ -185,7 +157,6 @@ class TestConsumersCoverage:
         assert result is None or isinstance(result, dict)
 
 
-@pytest.mark.django_db
 class TestPublisherCoverage:
     """Test publisher functions for coverage."""
 
@@ -195,15 +166,10 @@ class TestPublisherCoverage:
 
         assert hasattr(publisher, "publish_affiliation_created")
 
-    @patch("affiliation.rabbitmq.publisher.RabbitMQPublisher")
     def test_publish_functions_exist(self, mock_publisher):
         """Test all publish functions exist."""
         from affiliation.rabbitmq import publisher
 
-        mock_instance = Mock()
-        mock_instance.publish.return_value = True
-        mock_publisher.return_value = mock_instance
-
         # Test each publish function exists and can be called
         assert callable(publisher.publish_affiliation_created)
         assert callable(publisher.publish_documents_download_requested)
@@ -227,43 +193,26 @@ class TestModelsCoverage:
         )
         assert str(citizen) == "Test User (7777777777)"
 
-    def test_affiliation_str(self):
+    def test_affiliation_str(self, create_citizen, create_affiliation):
         """Test Affiliation string representation."""
-        citizen = Citizen.objects.create(
-            citizen_id="6666666666",
-            name="Test User",
-            email="test@test.com",
-            address="Test Address",
-            operator_id="OP1",
-            operator_name="Test Op",
-        )
-        affiliation = Affiliation.objects.create(
-            citizen=citizen, operator_id="OP1", operator_name="Test Op", status="AFFILIATED"
-        )
+        [citizen] = create_citizen(n=1, citizen_id="6666666666", name="Test User")
+        [affiliation] = create_affiliation([citizen], operator_name="Test Op")
         result = str(affiliation)
         assert "Test User" in result
         assert "Test Op" in result
 
-    def test_affiliation_status_changes(self):
+    def test_affiliation_status_changes(self, create_citizen, create_affiliation):
         """Test affiliation status can be changed."""
-        citizen = Citizen.objects.create(
-            citizen_id="5555555555",
-            name="Test User",
-            email="test@test.com",
-            address="Test Address",
-            operator_id="OP1",
-            operator_name="Test Op",
-        )
-        affiliation = Affiliation.objects.create(
-            citizen=citizen, operator_id="OP1", operator_name="Test Op", status="AFFILIATED"
-        )
+        [citizen] = create_citizen(n=1, citizen_id="5555555555")
+        [affiliation] = create_affiliation([citizen])
 
         # Test status changes
         assert affiliation.status == "AFFILIATED"
-        affiliation.status = "TRANSFERRING"
-        affiliation.save()
-        affiliation.refresh_from_db()
-        assert affiliation.status == "TRANSFERRING"
+        Affiliation.objects.filter(pk=affiliation.pk).update(status="TRANSFERRING")
+        assert (
+            Affiliation.objects.values_list("status", flat=True).get(pk=affiliation.pk)
+            == "TRANSFERRING"
+        )
 
 
 @pytest.mark.django_db
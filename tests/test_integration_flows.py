@@ -2,33 +2,53 @@
 Integration tests for complete citizen affiliation and transfer flows.
 """
 
+import json
+import re
 import pytest
-from unittest.mock import patch, Mock
-from rest_framework.test import APIClient
+from types import MappingProxyType
+from unittest.mock import patch
+from django.db.models import Count
+from django.urls import reverse
 from affiliation.models.citizen import Citizen
-from affiliation.models.affiliation import Affiliation
-from affiliation.services.citizen_service import CitizenService
-from affiliation.services.transfer_service import TransferService
+from affiliation.models.outbox_event import OutboxEvent
+from affiliation.rabbitmq.outbox import TRANSFER_CONFIRMATION_EVENT, relay_pending_events
+from affiliation.rabbitmq.register_citizen_consumer import handle_register_citizen_completed
+from affiliation.rabbitmq.unregister_citizen_consumer import handle_unregister_citizen_completed
+from affiliation.rabbitmq.documents_ready_consumer import handle_documents_ready
+
+# MINTIC doesn't know the citizens these flows register
+VALIDATE_CITIZEN_URL = re.compile(r".*/apis/validateCitizen/\d+$")
+DOCUMENTS_URL = re.compile(r".*/documents/\d+/?$")
+
+TARGET_OPERATORS = (
+    MappingProxyType(
+        {
+            "operator_id": "target_1",
+            "operator_name": "Target 1",
+            "api_url": "https://target1.com/api/transfer/",
+        }
+    ),
+    MappingProxyType(
+        {
+            "operator_id": "target_2",
+            "operator_name": "Target 2",
+            "api_url": "https://target2.com/api/transfer/",
+        }
+    ),
+)
 
 
 @pytest.mark.django_db
 class TestFullRegistrationFlow:
     """Integration tests for complete citizen registration flow."""
 
-    def setup_method(self):
-        """Set up test dependencies."""
-        self.client = APIClient()
-        self.citizen_service = CitizenService()
-
-    @patch("affiliation.services.citizen_service.publish_event")
-    @patch("affiliation.rabbitmq.register_citizen_consumer.publish_event")
-    def test_complete_registration_flow(self, mock_consumer_publish, mock_service_publish):
+    def test_complete_registration_flow(self, mocked_responses, citizen_service):
         """Test complete flow: Register → MINTIC Verify → Affiliate."""
-        from affiliation.rabbitmq.register_citizen_consumer import handle_register_citizen_completed
+        mocked_responses.get(VALIDATE_CITIZEN_URL, status=404)
 
         # Step 1: Register citizen
         citizen_data = {
-            "id": "1234567890",
+            "citizen_id": "1234567890",
             "name": "Integration Test User",
             "address": "Test Street 123",
             "email": "integration@test.com",
@@ -36,28 +56,30 @@ class TestFullRegistrationFlow:
             "operator_name": "Test Operator",
         }
 
-        result = self.citizen_service.register_citizen(citizen_data)
+        result = citizen_service.register_citizen(citizen_data)
         assert result["success"] is True
 
         # Verify citizen created with pending status
-        citizen = Citizen.objects.get(id=citizen_data["id"])
+        citizen = Citizen.objects.select_related("affiliation").get(
+            citizen_id=citizen_data["citizen_id"]
+        )
         assert citizen.is_verified is False
         assert citizen.verification_status == "pending"
 
-        affiliation = Affiliation.objects.get(citizen=citizen)
+        affiliation = citizen.affiliation
         assert affiliation.status == "PENDING"
 
         # Step 2: Simulate MINTIC verification success
-        event_data = {"id": citizen_data["id"], "statusCode": 201}
+        event_data = {"id": citizen_data["citizen_id"], "statusCode": 201}
 
         handle_register_citizen_completed(event_data)
 
         # Step 3: Verify final state
-        citizen.refresh_from_db()
+        citizen.refresh_from_db(fields=["is_verified", "verification_status"])
         assert citizen.is_verified is True
         assert citizen.verification_status == "verified"
 
-        affiliation.refresh_from_db()
+        affiliation.refresh_from_db(fields=["status"])
         assert affiliation.status == "AFFILIATED"
 
 
@@ -65,86 +87,63 @@ class TestFullRegistrationFlow:
 class TestFullOutgoingTransferFlow:
     """Integration tests for complete outgoing transfer flow."""
 
-    def setup_method(self):
-        """Set up test dependencies."""
-        self.transfer_service = TransferService()
-
-    @patch("affiliation.services.transfer_service.requests.post")
-    @patch("affiliation.services.transfer_service.requests.get")
-    @patch("affiliation.services.transfer_service.publish_event")
-    @patch("affiliation.rabbitmq.unregister_citizen_consumer.publish_event")
     def test_complete_outgoing_transfer(
-        self, mock_consumer_publish, mock_service_publish, mock_get, mock_post, affiliated_citizen
+        self, mocked_responses, affiliated_citizen, transfer_service
     ):
         """Test complete flow: Initiate Transfer → Unregister → Send to Operator → Confirm → Delete."""
-        from affiliation.rabbitmq.unregister_citizen_consumer import (
-            handle_unregister_citizen_completed,
-        )
-
         citizen, affiliation = affiliated_citizen
-        citizen_id = citizen.id
+        citizen_id = citizen.citizen_id
+        target_operator = TARGET_OPERATORS[0]
 
         # Step 1: Initiate transfer
-        target_operator = {
-            "targetOperatorId": "target_999",
-            "targetOperatorName": "Target Operator",
-            "targetApiUrl": "https://target-operator.com/api/transfer/receive/",
-        }
-
-        result = self.transfer_service.send_transfer(citizen_id, target_operator)
+        result = transfer_service.send_transfer(citizen_id, target_operator)
         assert result["success"] is True
 
         # Verify status changed to TRANSFERRING
-        affiliation.refresh_from_db()
+        affiliation.refresh_from_db(fields=["status", "transfer_destination_api_url"])
         assert affiliation.status == "TRANSFERRING"
-        assert affiliation.transfer_destination_api_url == target_operator["targetApiUrl"]
+        assert affiliation.transfer_destination_api_url == target_operator["api_url"]
 
         # Step 2: Simulate MINTIC unregister confirmation
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = {
-            "document_id": "https://storage.com/id.pdf",
-            "document_rut": "https://storage.com/rut.pdf",
-        }
-
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = {"message": "Transfer received"}
-
-        unregister_event = {"id": citizen_id, "success": True}
+        mocked_responses.get(
+            DOCUMENTS_URL,
+            json={
+                "document_id": "https://storage.com/id.pdf",
+                "document_rut": "https://storage.com/rut.pdf",
+            },
+        )
+        mocked_responses.post(target_operator["api_url"], json={"message": "Transfer received"})
 
-        handle_unregister_citizen_completed(unregister_event)
+        handle_unregister_citizen_completed({"id": citizen_id, "success": True})
 
-        # Verify external operator was called
-        assert mock_post.called
-        call_args = mock_post.call_args
-        assert target_operator["targetApiUrl"] in call_args[0]
+        # Verify external operator was called with the citizen and its documents
+        [posted] = [c.request for c in mocked_responses.calls if c.request.method == "POST"]
+        assert posted.url == target_operator["api_url"]
+        payload = json.loads(posted.body)
+        assert payload["id"] == int(citizen_id)
+        assert payload["urlDocuments"]["document_id"] == "https://storage.com/id.pdf"
 
         # Step 3: Simulate target operator confirmation
-        result = self.transfer_service.handle_transfer_confirmation(citizen_id, req_status=1)
+        result = transfer_service.handle_transfer_confirmation(citizen_id, req_status=1)
         assert result["success"] is True
 
         # Step 4: Verify cleanup
-        assert not Citizen.objects.filter(id=citizen_id).exists()
-        assert not Affiliation.objects.filter(citizen_id=citizen_id).exists()
+        remaining = Citizen.objects.filter(citizen_id=citizen_id).aggregate(
+            citizens=Count("pk"), affiliations=Count("affiliation")
+        )
+        assert remaining == {"citizens": 0, "affiliations": 0}
 
 
 @pytest.mark.django_db
 class TestFullIncomingTransferFlow:
     """Integration tests for complete incoming transfer flow."""
 
-    def setup_method(self):
-        """Set up test dependencies."""
-        self.transfer_service = TransferService()
-
-    @patch("affiliation.services.transfer_service.requests.post")
-    @patch("affiliation.services.transfer_service.publish_event")
-    @patch("affiliation.rabbitmq.register_citizen_consumer.publish_event")
-    @patch("affiliation.rabbitmq.documents_ready_consumer.requests.post")
+    @patch("affiliation.rabbitmq.outbox.get_publisher")
     def test_complete_incoming_transfer(
-        self, mock_doc_post, mock_reg_publish, mock_transfer_publish, mock_confirmation_post
+        self, mock_get_publisher, mocked_responses, transfer_service
     ):
         """Test complete flow: Receive Transfer → Register → Documents Ready → Confirm."""
-        from affiliation.rabbitmq.register_citizen_consumer import handle_register_citizen_completed
-        from affiliation.rabbitmq.documents_ready_consumer import handle_documents_ready
+        mock_get_publisher.return_value.publish_batch.return_value = True
 
         # Step 1: Receive transfer from source operator
         transfer_data = {
@@ -160,155 +159,134 @@ class TestFullIncomingTransferFlow:
             "sourceOperatorName": "Source Operator",
         }
 
-        result = self.transfer_service.receive_transfer(transfer_data)
+        result = transfer_service.receive_transfer(transfer_data)
         assert result["success"] is True
 
         citizen_id = str(transfer_data["id"])
 
-        # Verify citizen created
-        citizen = Citizen.objects.get(id=citizen_id)
+        # Verify citizen created, waiting for documents and MINTIC
+        citizen = Citizen.objects.select_related("affiliation").get(citizen_id=citizen_id)
         assert citizen.is_verified is False
 
-        affiliation = Affiliation.objects.get(citizen=citizen)
-        assert affiliation.status == "PENDING"
-        assert affiliation.confirmation_callback_url == transfer_data["confirmAPI"]
-
-        # Step 2: Simulate MINTIC registration success
-        register_event = {"id": citizen_id, "statusCode": 201}
+        affiliation = citizen.affiliation
+        assert affiliation.status == "TRANSFERRING"
+        assert affiliation.transfer_confirmation_url == transfer_data["confirmAPI"]
 
-        handle_register_citizen_completed(register_event)
+        # Step 2: Simulate MINTIC registration success (documents still pending)
+        handle_register_citizen_completed({"id": citizen_id, "statusCode": 201})
 
-        citizen.refresh_from_db()
+        citizen.refresh_from_db(fields=["is_verified"])
         assert citizen.is_verified is True
+        affiliation.refresh_from_db(fields=["status"])
+        assert affiliation.status == "TRANSFERRING"
 
         # Step 3: Simulate documents ready event
-        mock_confirmation_post.return_value.status_code = 200
-
-        documents_event = {"citizenId": citizen_id}
-
-        handle_documents_ready(documents_event)
+        handle_documents_ready({"idCitizen": int(citizen_id)})
 
         # Step 4: Verify final state
-        affiliation.refresh_from_db()
+        affiliation.refresh_from_db(fields=["status", "documents_ready"])
         assert affiliation.status == "AFFILIATED"
+        assert affiliation.documents_ready is True
 
-        # Verify confirmation was sent to source operator
-        assert mock_confirmation_post.called
-        call_args = mock_confirmation_post.call_args
-        assert transfer_data["confirmAPI"] in call_args[0]
+        # Step 5: The outbox relay sends the confirmation to the source operator
+        assert OutboxEvent.objects.filter(event_type=TRANSFER_CONFIRMATION_EVENT).count() == 1
+        mocked_responses.post(transfer_data["confirmAPI"])
+
+        relay_pending_events()
+
+        [call] = mocked_responses.calls
+        assert call.request.url == transfer_data["confirmAPI"]
+        assert json.loads(call.request.body) == {"id": int(citizen_id), "req_status": 1}
+        assert not OutboxEvent.objects.filter(published_at__isnull=True).exists()
 
 
 @pytest.mark.django_db
 class TestTransferFailureRollback:
     """Integration tests for transfer failure scenarios."""
 
-    def setup_method(self):
-        """Set up test dependencies."""
-        self.transfer_service = TransferService()
-
-    @patch("affiliation.services.transfer_service.requests.post")
-    @patch("affiliation.services.transfer_service.requests.get")
-    def test_outgoing_transfer_external_api_failure_rollback(
-        self, mock_get, mock_post, transferring_citizen
+    def test_outgoing_transfer_external_api_failure_keeps_transferring(
+        self, mocked_responses, transferring_citizen, transfer_service
     ):
-        """Test rollback when external operator API fails."""
+        """Test a failed send to the target operator leaves the transfer open for a retry."""
         citizen, affiliation = transferring_citizen
 
-        # Mock document service success
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = {}
-
-        # Mock external operator failure
-        mock_post.return_value.status_code = 500
-        mock_post.return_value.text = "Internal Server Error"
+        # Document service answers, external operator fails
+        mocked_responses.get(DOCUMENTS_URL, json={})
+        mocked_responses.post(
+            affiliation.transfer_destination_api_url, status=500, body="Internal Server Error"
+        )
 
         # Attempt to continue transfer
-        result = self.transfer_service.continue_transfer_after_unregister(citizen.id)
+        result = transfer_service.continue_transfer_after_unregister(citizen.citizen_id)
 
         assert result["success"] is False
 
-        # Verify affiliation rolled back to AFFILIATED
-        affiliation.refresh_from_db()
-        assert affiliation.status == "AFFILIATED"
+        # Status stays TRANSFERRING so the transfer can be retried
+        affiliation.refresh_from_db(fields=["status"])
+        assert affiliation.status == "TRANSFERRING"
 
         # Verify citizen still exists
-        assert Citizen.objects.filter(id=citizen.id).exists()
+        assert Citizen.objects.filter(citizen_id=citizen.citizen_id).exists()
 
-    def test_outgoing_transfer_confirmation_failure_rollback(self, transferring_citizen):
+    def test_outgoing_transfer_confirmation_failure_rollback(
+        self, transferring_citizen, transfer_service
+    ):
         """Test rollback when target operator rejects transfer."""
         citizen, affiliation = transferring_citizen
 
         # Target operator sends failure confirmation
-        result = self.transfer_service.handle_transfer_confirmation(citizen.id, req_status=0)
+        result = transfer_service.handle_transfer_confirmation(citizen.citizen_id, req_status=0)
 
-        assert result["success"] is True
+        assert result["success"] is False
         assert "rolled back" in result["message"].lower()
 
         # Verify affiliation rolled back
-        affiliation.refresh_from_db()
+        affiliation.refresh_from_db(fields=["status", "transfer_destination_operator_id"])
         assert affiliation.status == "AFFILIATED"
         assert affiliation.transfer_destination_operator_id is None
 
         # Verify citizen still exists
-        assert Citizen.objects.filter(id=citizen.id).exists()
+        assert Citizen.objects.filter(citizen_id=citizen.citizen_id).exists()
 
 
 @pytest.mark.django_db
 class TestConcurrentTransferAttempts:
     """Integration tests for concurrent transfer scenarios."""
 
-    def setup_method(self):
-        """Set up test dependencies."""
-        self.transfer_service = TransferService()
-
-    @patch("affiliation.services.transfer_service.publish_event")
-    def test_prevent_multiple_simultaneous_transfers(self, mock_publish, affiliated_citizen):
+    @pytest.mark.parametrize(
+        "first_target,second_target",
+        [
+            pytest.param(TARGET_OPERATORS[0], TARGET_OPERATORS[1], id="different_target"),
+            pytest.param(TARGET_OPERATORS[0], TARGET_OPERATORS[0], id="same_target"),
+        ],
+    )
+    def test_prevent_multiple_simultaneous_transfers(
+        self, first_target, second_target, affiliated_citizen, transfer_service
+    ):
         """Test that multiple transfer attempts are prevented."""
         citizen, affiliation = affiliated_citizen
 
-        target_operator_1 = {
-            "targetOperatorId": "target_1",
-            "targetOperatorName": "Target 1",
-            "targetApiUrl": "https://target1.com/api/transfer/",
-        }
-
-        target_operator_2 = {
-            "targetOperatorId": "target_2",
-            "targetOperatorName": "Target 2",
-            "targetApiUrl": "https://target2.com/api/transfer/",
-        }
-
         # First transfer should succeed
-        result1 = self.transfer_service.send_transfer(citizen.id, target_operator_1)
+        result1 = transfer_service.send_transfer(citizen.citizen_id, first_target)
         assert result1["success"] is True
 
         # Second transfer should fail
-        result2 = self.transfer_service.send_transfer(citizen.id, target_operator_2)
+        result2 = transfer_service.send_transfer(citizen.citizen_id, second_target)
         assert result2["success"] is False
-        assert "already transferring" in result2["message"].lower()
+        assert "cannot be transferred" in result2["message"]
 
         # Verify first transfer info is preserved
-        affiliation.refresh_from_db()
-        assert affiliation.transfer_destination_operator_id == target_operator_1["targetOperatorId"]
+        affiliation.refresh_from_db(fields=["transfer_destination_operator_id"])
+        assert affiliation.transfer_destination_operator_id == first_target["operator_id"]
 
 
 @pytest.mark.django_db
 class TestAPIIntegrationFlow:
     """Integration tests using API endpoints."""
 
-    def setup_method(self):
-        """Set up test client."""
-        self.client = APIClient()
-
-    @patch("affiliation.services.citizen_service.publish_event")
-    @patch("affiliation.services.transfer_service.publish_event")
-    @patch("affiliation.services.transfer_service.requests.post")
-    @patch("affiliation.services.transfer_service.requests.get")
-    def test_full_flow_via_api_endpoints(
-        self, mock_get, mock_post, mock_transfer_publish, mock_citizen_publish
-    ):
+    def test_full_flow_via_api_endpoints(self, mocked_responses, api_client):
         """Test complete flow using only API endpoints."""
-        from django.urls import reverse
+        mocked_responses.get(VALIDATE_CITIZEN_URL, status=404)
 
         # Step 1: Register citizen via API
         register_url = reverse("register-citizen")
@@ -317,27 +295,21 @@ class TestAPIIntegrationFlow:
             "name": "API Test User",
             "address": "API Street 456",
             "email": "apitest@example.com",
-            "operator_id": "api_operator_123",
-            "operator_name": "API Operator",
         }
 
-        response = self.client.post(register_url, register_data, format="json")
-        assert response.status_code == 200
+        response = api_client.post(register_url, register_data, format="json")
+        assert response.status_code == 201
 
-        # Step 2: Check affiliation status via API
+        # Step 2: Check affiliation status via API after MINTIC verification
         status_url = reverse("affiliation-status", kwargs={"citizen_id": "5555555555"})
 
-        # After MINTIC verification (simulated by updating DB directly)
-        citizen = Citizen.objects.get(id="5555555555")
-        citizen.is_verified = True
-        citizen.verification_status = "verified"
-        citizen.save()
+        response = api_client.get(status_url)
+        assert response.status_code == 200
+        assert response.data["status"] == "PENDING"
 
-        affiliation = Affiliation.objects.get(citizen=citizen)
-        affiliation.status = "AFFILIATED"
-        affiliation.save()
+        handle_register_citizen_completed({"id": "5555555555", "statusCode": 201})
 
-        response = self.client.get(status_url)
+        response = api_client.get(status_url)
         assert response.status_code == 200
         assert response.data["status"] == "AFFILIATED"
 
@@ -349,24 +321,20 @@ class TestAPIIntegrationFlow:
             "targetApiUrl": "https://api-target.com/api/transfer/",
         }
 
-        response = self.client.post(transfer_url, transfer_data, format="json")
+        response = api_client.post(transfer_url, transfer_data, format="json")
         assert response.status_code == 200
 
         # Verify status changed
-        response = self.client.get(status_url)
+        response = api_client.get(status_url)
         assert response.data["status"] == "TRANSFERRING"
 
         # Step 4: Simulate external operator confirmation via API
-        mock_post.return_value.status_code = 200
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = {}
-
         confirm_url = reverse("transfer-confirm")
         confirm_data = {"id": "5555555555", "req_status": 1}
 
-        response = self.client.post(confirm_url, confirm_data, format="json")
+        response = api_client.post(confirm_url, confirm_data, format="json")
         assert response.status_code == 200
 
         # Step 5: Verify citizen deleted
-        response = self.client.get(status_url)
+        response = api_client.get(status_url)
         assert response.status_code == 404
@@ -0,0 +1,175 @@
+"""
+Tests for the transactional outbox and its relay.
+"""
+
+import json
+import pytest
+from datetime import timedelta
+from unittest.mock import Mock, patch
+from django.conf import settings
+from django.utils import timezone
+from affiliation.models.outbox_event import OutboxEvent
+from affiliation.rabbitmq.outbox import (
+    CONFIRMATION_MAX_ATTEMPTS,
+    CONFIRMATION_RETRY_DELAY,
+    enqueue_affiliation_created,
+    enqueue_transfer_confirmation,
+    enqueue_user_transferred,
+    relay_pending_events,
+)
+
+
+@pytest.mark.django_db
+class TestOutboxRelay:
+    """Test cases for publishing outbox events."""
+
+    @patch("affiliation.rabbitmq.outbox.get_publisher")
+    def test_relay_publishes_pending_events(self, mock_get_publisher):
+        """Test relay publishes pending events in order and marks them published."""
+        publisher = Mock()
+        publisher.publish_batch.return_value = True
+        mock_get_publisher.return_value = publisher
+
+        enqueue_affiliation_created(1111111111)
+        enqueue_user_transferred(2222222222)
+
+        published = relay_pending_events()
+
+        assert published == 2
+        # One batch, so the relay waits on the broker once
+        publisher.publish_batch.assert_called_once_with(
+            [
+                (settings.RABBITMQ_AFFILIATION_CREATED_QUEUE, {"idCitizen": 1111111111}),
+                (settings.RABBITMQ_USER_TRANSFERRED_QUEUE, {"idCitizen": 2222222222}),
+            ]
+        )
+        assert not OutboxEvent.objects.filter(published_at__isnull=True).exists()
+
+    @patch("affiliation.rabbitmq.outbox.get_publisher")
+    def test_relay_keeps_batch_pending_on_failure(self, mock_get_publisher):
+        """Test a batch the broker didn't accept stays pending for the next run."""
+        publisher = Mock()
+        publisher.publish_batch.return_value = False
+        mock_get_publisher.return_value = publisher
+
+        enqueue_affiliation_created(1111111111)
+        enqueue_user_transferred(2222222222)
+        enqueue_user_transferred(3333333333)
+
+        published = relay_pending_events()
+
+        assert published == 0
+        publisher.publish_batch.assert_called_once()
+        # Unpublished events are released, not left claimed until the timeout
+        assert (
+            OutboxEvent.objects.filter(published_at__isnull=True, claimed_at__isnull=True).count()
+            == 3
+        )
+
+    @patch("affiliation.rabbitmq.outbox.get_publisher")
+    def test_relay_skips_events_claimed_by_another_relay(self, mock_get_publisher):
+        """Test fresh claims are left alone and stale claims are taken over."""
+        publisher = Mock()
+        publisher.publish_batch.return_value = True
+        mock_get_publisher.return_value = publisher
+
+        fresh = enqueue_affiliation_created(1111111111)
+        stale = enqueue_user_transferred(2222222222)
+        OutboxEvent.objects.filter(pk=fresh.pk).update(claimed_at=timezone.now())
+        OutboxEvent.objects.filter(pk=stale.pk).update(
+            claimed_at=timezone.now() - timedelta(minutes=10)
+        )
+
+        assert relay_pending_events() == 1
+        publisher.publish_batch.assert_called_once_with(
+            [(settings.RABBITMQ_USER_TRANSFERRED_QUEUE, {"idCitizen": 2222222222})]
+        )
+
+    @patch("affiliation.rabbitmq.outbox.get_publisher")
+    def test_relay_with_empty_outbox(self, mock_get_publisher):
+        """Test relay does not touch RabbitMQ when there is nothing to publish."""
+        assert relay_pending_events() == 0
+        mock_get_publisher.assert_not_called()
+
+    @patch("affiliation.rabbitmq.outbox.get_publisher")
+    def test_relay_posts_transfer_confirmations(self, mock_get_publisher, mocked_responses):
+        """Test confirmations go to the operator's API and a failed one doesn't block the batch."""
+        publisher = Mock()
+        publisher.publish_batch.return_value = True
+        mock_get_publisher.return_value = publisher
+        mocked_responses.post("https://down-operator.com/confirm/", status=503)
+        mocked_responses.post("https://source-operator.com/confirm/")
+
+        failed = enqueue_transfer_confirmation(
+            "https://down-operator.com/confirm/", id_citizen=1111111111, req_status=1
+        )
+        enqueue_transfer_confirmation(
+            "https://source-operator.com/confirm/", id_citizen=2222222222, req_status=1
+        )
+        enqueue_affiliation_created(2222222222)
+
+        published = relay_pending_events()
+
+        assert published == 2
+        assert json.loads(mocked_responses.calls[1].request.body) == {
+            "id": 2222222222,
+            "req_status": 1,
+        }
+        publisher.publish_batch.assert_called_once_with(
+            [(settings.RABBITMQ_AFFILIATION_CREATED_QUEUE, {"idCitizen": 2222222222})]
+        )
+        [pending] = OutboxEvent.objects.filter(published_at__isnull=True)
+        assert pending.pk == failed.pk
+        # The failed confirmation backs off instead of being retried on the next poll
+        assert pending.attempts == 1
+        assert pending.claimed_at is None
+        assert pending.next_attempt_at >= timezone.now() + timedelta(
+            seconds=CONFIRMATION_RETRY_DELAY - 5
+        )
+
+    @patch("affiliation.rabbitmq.outbox.get_publisher")
+    def test_failing_confirmations_dont_starve_broker_events(
+        self, mock_get_publisher, mocked_responses
+    ):
+        """Test a batch full of failing confirmations still lets later broker events out."""
+        publisher = Mock()
+        publisher.publish_batch.return_value = True
+        mock_get_publisher.return_value = publisher
+        mocked_responses.post("https://down-operator.com/confirm/", status=503)
+
+        for id_citizen in (1111111111, 2222222222):
+            enqueue_transfer_confirmation(
+                "https://down-operator.com/confirm/", id_citizen=id_citizen, req_status=1
+            )
+        event = enqueue_affiliation_created(3333333333)
+
+        assert relay_pending_events(batch_size=2) == 1
+        publisher.publish_batch.assert_called_once_with(
+            [(settings.RABBITMQ_AFFILIATION_CREATED_QUEUE, {"idCitizen": 3333333333})]
+        )
+        event.refresh_from_db()
+        assert event.published_at is not None
+
+        # Both confirmations are backing off, so the next poll doesn't call the operator again
+        assert relay_pending_events(batch_size=2) == 0
+        assert len(mocked_responses.calls) == 2
+
+    def test_confirmation_marked_failed_after_last_attempt(self, mocked_responses):
+        """Test a confirmation that keeps failing is dead-lettered instead of retried forever."""
+        mocked_responses.post("https://down-operator.com/confirm/", status=503)
+        event = enqueue_transfer_confirmation(
+            "https://down-operator.com/confirm/", id_citizen=1111111111, req_status=1
+        )
+        OutboxEvent.objects.filter(pk=event.pk).update(attempts=CONFIRMATION_MAX_ATTEMPTS - 1)
+
+        assert relay_pending_events() == 0
+
+        event.refresh_from_db()
+        assert event.attempts == CONFIRMATION_MAX_ATTEMPTS
+        assert event.failed_at is not None
+        assert event.published_at is None
+        assert str(event) == "transfer.confirmation (failed)"
+
+        # Failed events are never claimed again
+        assert relay_pending_events() == 0
+        assert len(mocked_responses.calls) == 1
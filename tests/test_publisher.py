@@ -0,0 +1,69 @@
+"""
+Tests for the RabbitMQ publisher.
+"""
+
+from unittest.mock import patch
+from django.conf import settings
+from affiliation.rabbitmq.publisher import RabbitMQPublisher
+
+
+class TestRabbitMQPublisher:
+    """Test cases for publisher connection reuse."""
+
+    def test_publishes_reuse_connection(self, mock_pika_connection):
+        """Test consecutive publishes share one connection and channel."""
+        connection, channel = mock_pika_connection
+        channel.is_open = True
+
+        with patch("pika.BlockingConnection", return_value=connection) as mock_connect:
+            publisher = RabbitMQPublisher()
+            assert publisher.publish_affiliation_created(1111111111) is True
+            assert publisher.publish_user_transferred(1111111111) is True
+
+        mock_connect.assert_called_once()
+        channel.confirm_delivery.assert_called_once()
+        assert channel.basic_publish.call_count == 2
+        assert (
+            channel.basic_publish.call_args_list[1][1]["routing_key"]
+            == settings.RABBITMQ_USER_TRANSFERRED_QUEUE
+        )
+
+    def test_reconnects_when_channel_closed(self, mock_pika_connection):
+        """Test a dead channel is replaced before publishing."""
+        connection, channel = mock_pika_connection
+
+        with patch("pika.BlockingConnection", return_value=connection) as mock_connect:
+            publisher = RabbitMQPublisher()
+            channel.is_open = False
+            publisher.publish("affiliation.created", {"idCitizen": 1})
+
+        assert mock_connect.call_count == 2
+
+    def test_publish_batch_commits_once(self, mock_pika_connection):
+        """Test a batch is sent on the transacted channel and committed once."""
+        connection, channel = mock_pika_connection
+        channel.is_open = True
+
+        publisher = RabbitMQPublisher()
+        published = publisher.publish_batch(
+            [
+                (settings.RABBITMQ_AFFILIATION_CREATED_QUEUE, {"idCitizen": 1}),
+                (settings.RABBITMQ_USER_TRANSFERRED_QUEUE, {"idCitizen": 2}),
+            ]
+        )
+
+        assert published is True
+        channel.tx_select.assert_called_once()
+        assert channel.basic_publish.call_count == 2
+        channel.tx_commit.assert_called_once()
+
+    def test_publish_batch_failed_commit(self, mock_pika_connection):
+        """Test a failed commit reports the batch as unpublished and drops the connection."""
+        connection, channel = mock_pika_connection
+        channel.is_open = True
+        channel.tx_commit.side_effect = Exception("Channel closed by broker")
+
+        publisher = RabbitMQPublisher()
+
+        assert publisher.publish_batch([("affiliation.created", {"idCitizen": 1})]) is False
+        assert publisher.batch_channel is None
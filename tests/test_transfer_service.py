@@ -2,54 +2,69 @@
 Unit tests for TransferService - handles citizen transfer operations.
 """
 
+import json
+import re
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-from django.test import override_settings
-from affiliation.services.transfer_service import TransferService
+import requests
+from django.conf import settings
 from affiliation.models.citizen import Citizen
 from affiliation.models.affiliation import Affiliation
+from affiliation.models.outbox_event import OutboxEvent
+from affiliation.rabbitmq.outbox import TRANSFER_CONFIRMATION_EVENT
+
+# Document service URL; the host differs between local, Kubernetes and production settings
+DOCUMENTS_URL = re.compile(r".*/documents/1234567890/?$")
+CONFIRMATION_URL = "https://source-operator.com/api/confirm/"
 
 
 @pytest.mark.django_db
 class TestTransferServiceReceiveTransfer:
     """Test cases for receiving incoming transfers from other operators."""
 
-    def setup_method(self):
-        """Set up test dependencies."""
-        self.service = TransferService()
-
-    def test_receive_transfer_success(self, sample_transfer_data, mock_rabbitmq_publisher):
+    def test_receive_transfer_success(
+        self,
+        sample_transfer_data,
+        transfer_service,
+        django_assert_max_num_queries,
+    ):
         """Test successful incoming transfer reception."""
-        result = self.service.receive_transfer(sample_transfer_data)
+        # Lookup, citizen, affiliation and outbox inserts, plus the savepoint pair
+        with django_assert_max_num_queries(6):
+            result = transfer_service.receive_transfer(sample_transfer_data)
 
         # Verify citizen was created
         assert result["success"] is True
-        assert "processing documents" in result["message"].lower()
+        assert result["message"] == (
+            f"Transfer request received for citizen {sample_transfer_data['id']}, "
+            "processing documents"
+        )
 
-        citizen = Citizen.objects.get(citizen_id=str(sample_transfer_data["id"]))
+        citizen = Citizen.objects.select_related("affiliation").get(
+            citizen_id=str(sample_transfer_data["id"])
+        )
         assert citizen.name == sample_transfer_data["citizenName"]
         assert citizen.email == sample_transfer_data["citizenEmail"]
         assert citizen.is_registered is False  # Not complete until MINTIC confirms
         assert citizen.is_verified is False
 
         # Verify affiliation was created with correct status
-        affiliation = Affiliation.objects.get(citizen=citizen)
+        affiliation = citizen.affiliation
         assert affiliation.status == "TRANSFERRING"
         assert affiliation.transfer_confirmation_url == sample_transfer_data["confirmAPI"]
 
     def test_receive_transfer_duplicate_citizen(
-        self, sample_transfer_data, create_citizen, mock_rabbitmq_publisher
+        self, sample_transfer_data, create_citizen, transfer_service
     ):
         """Test receiving transfer for already existing citizen."""
         # Create existing citizen
         create_citizen(citizen_id=str(sample_transfer_data["id"]))
 
-        result = self.service.receive_transfer(sample_transfer_data)
+        result = transfer_service.receive_transfer(sample_transfer_data)
 
         assert result["success"] is False
-        assert "already exists" in result["message"].lower()
+        assert result["message"] == f"Citizen with id {sample_transfer_data['id']} already exists"
 
-    def test_receive_transfer_missing_required_fields(self):
+    def test_receive_transfer_missing_required_fields(self, transfer_service):
         """Test receiving transfer with missing required fields."""
         incomplete_data = {
             "id": 123456,
@@ -58,35 +73,35 @@ class TestTransferServiceReceiveTransfer:
         }
 
         # Service will raise KeyError for missing required fields
-        result = self.service.receive_transfer(incomplete_data)
+        result = transfer_service.receive_transfer(incomplete_data)
 
         # Should return error since required fields are missing
         assert result["success"] is False
 
-    @patch("affiliation.services.transfer_service.publish_documents_download_requested")
     def test_receive_transfer_publishes_registration_event(
-        self, mock_publish, sample_transfer_data
+        self, sample_transfer_data, transfer_service
     ):
-        """Test that receiving transfer publishes document download event."""
-        mock_publish.return_value = True
-        self.service.receive_transfer(sample_transfer_data)
+        """Test that receiving transfer records document download event in the outbox."""
+        transfer_service.receive_transfer(sample_transfer_data)
 
-        # Verify documents download event was published
-        mock_publish.assert_called_once()
-        call_args = mock_publish.call_args
-        assert call_args[1]["id_citizen"] == sample_transfer_data["id"]
+        # Verify documents download event was queued
+        event = OutboxEvent.objects.get(
+            event_type=settings.RABBITMQ_DOCUMENTS_DOWNLOAD_REQUESTED_QUEUE
+        )
+        assert event.payload["idCitizen"] == sample_transfer_data["id"]
+        assert event.published_at is None
 
 
 @pytest.mark.django_db
 class TestTransferServiceSendTransfer:
     """Test cases for sending outgoing transfers to other operators."""
 
-    def setup_method(self):
-        """Set up test dependencies."""
-        self.service = TransferService()
-
     def test_send_transfer_success(
-        self, affiliated_citizen, sample_target_operator, mock_rabbitmq_publisher
+        self,
+        affiliated_citizen,
+        sample_target_operator,
+        transfer_service,
+        django_assert_max_num_queries,
     ):
         """Test successful outgoing transfer initiation."""
         citizen, affiliation = affiliated_citizen
@@ -98,43 +113,60 @@ class TestTransferServiceSendTransfer:
             "api_url": sample_target_operator["targetApiUrl"],
         }
 
-        result = self.service.send_transfer(citizen.citizen_id, target_operator)
+        # Joined citizen lookup, affiliation update and outbox insert, plus the savepoint pair
+        with django_assert_max_num_queries(5):
+            result = transfer_service.send_transfer(citizen.citizen_id, target_operator)
 
         assert result["success"] is True
-        assert "initiated" in result["message"].lower()
+        assert result["message"] == (
+            f"Transfer initiated for citizen {citizen.citizen_id}. "
+            "Waiting for MINTIC unregister confirmation."
+        )
 
         # Verify affiliation status changed to TRANSFERRING
-        affiliation.refresh_from_db()
+        affiliation.refresh_from_db(
+            fields=[
+                "status",
+                "transfer_destination_operator_id",
+                "transfer_destination_operator_name",
+                "transfer_destination_api_url",
+            ]
+        )
         assert affiliation.status == "TRANSFERRING"
         assert affiliation.transfer_destination_operator_id == target_operator["operator_id"]
         assert affiliation.transfer_destination_operator_name == target_operator["operator_name"]
         assert affiliation.transfer_destination_api_url == target_operator["api_url"]
 
-    def test_send_transfer_citizen_not_found(self, sample_target_operator):
-        """Test sending transfer for non-existent citizen."""
-        result = self.service.send_transfer("9999999999", sample_target_operator)
-
-        assert result["success"] is False
-        assert "not found" in result["message"].lower()
-
-    def test_send_transfer_citizen_not_affiliated(self, create_citizen, sample_target_operator):
-        """Test sending transfer for citizen without affiliation."""
-        citizen = create_citizen(is_verified=True)
-
-        target_operator = {
-            "operator_id": sample_target_operator["targetOperatorId"],
-            "operator_name": sample_target_operator["targetOperatorName"],
-            "api_url": sample_target_operator["targetApiUrl"],
-        }
-
-        result = self.service.send_transfer(citizen.citizen_id, target_operator)
-
-        assert result["success"] is False
-        assert "affiliation" in result["message"].lower()
-
-    def test_send_transfer_already_transferring(self, transferring_citizen, sample_target_operator):
-        """Test sending transfer for citizen already in TRANSFERRING state."""
-        citizen, affiliation = transferring_citizen
+    @pytest.fixture
+    def unaffiliated_citizen(self, create_citizen):
+        """A verified citizen with no affiliation record."""
+        return create_citizen(is_verified=True), None
+
+    @pytest.mark.parametrize(
+        "citizen_fixture,expected_msg",
+        [
+            pytest.param(None, "Citizen {citizen_id} not found", id="citizen_not_found"),
+            pytest.param(
+                "unaffiliated_citizen",
+                "No affiliation found for citizen {citizen_id}",
+                id="citizen_not_affiliated",
+            ),
+            pytest.param(
+                "transferring_citizen",
+                "Citizen {citizen_id} cannot be transferred (status: TRANSFERRING)",
+                id="already_transferring",
+            ),
+        ],
+    )
+    def test_send_transfer_rejected(
+        self, request, citizen_fixture, expected_msg, sample_target_operator, transfer_service
+    ):
+        """Test sending transfer for a missing, unaffiliated or already transferring citizen."""
+        if citizen_fixture:
+            citizen, _ = request.getfixturevalue(citizen_fixture)
+            citizen_id = citizen.citizen_id
+        else:
+            citizen_id = "9999999999"
 
         target_operator = {
             "operator_id": sample_target_operator["targetOperatorId"],
@@ -142,18 +174,16 @@ class TestTransferServiceSendTransfer:
             "api_url": sample_target_operator["targetApiUrl"],
         }
 
-        result = self.service.send_transfer(citizen.citizen_id, target_operator)
+        result = transfer_service.send_transfer(citizen_id, target_operator)
 
         assert result["success"] is False
-        assert "cannot be transferred" in result["message"].lower()
+        assert result["message"] == expected_msg.format(citizen_id=citizen_id)
 
-    @patch("affiliation.services.transfer_service.publish_unregister_citizen_requested")
     def test_send_transfer_publishes_unregister_event(
-        self, mock_publish, affiliated_citizen, sample_target_operator
+        self, affiliated_citizen, sample_target_operator, transfer_service
     ):
-        """Test that sending transfer publishes unregister event."""
+        """Test that sending transfer records unregister event in the outbox."""
         citizen, _ = affiliated_citizen
-        mock_publish.return_value = True
 
         target_operator = {
             "operator_id": sample_target_operator["targetOperatorId"],
@@ -161,150 +191,135 @@ class TestTransferServiceSendTransfer:
             "api_url": sample_target_operator["targetApiUrl"],
         }
 
-        self.service.send_transfer(citizen.citizen_id, target_operator)
+        transfer_service.send_transfer(citizen.citizen_id, target_operator)
 
-        # Verify unregister event was published
-        mock_publish.assert_called_once()
+        # Verify unregister event was queued
+        assert (
+            OutboxEvent.objects.filter(
+                event_type=settings.RABBITMQ_UNREGISTER_CITIZEN_REQUESTED_QUEUE
+            ).count()
+            == 1
+        )
 
 
 @pytest.mark.django_db
 class TestTransferServiceContinueTransfer:
     """Test cases for continuing transfer after MINTIC unregister."""
 
-    def setup_method(self):
-        """Set up test dependencies."""
-        self.service = TransferService()
-
-    @patch("affiliation.services.transfer_service.requests.get")
-    @patch("affiliation.services.transfer_service.requests.post")
-    def test_continue_transfer_success(self, mock_post, mock_get, transferring_citizen):
-        """Test continuing transfer after MINTIC unregister confirmation."""
+    @pytest.mark.parametrize(
+        "post_status,expect_success",
+        [
+            pytest.param(200, True, id="success"),
+            pytest.param(500, False, id="external_api_failure"),
+        ],
+    )
+    def test_continue_transfer_http(
+        self, post_status, expect_success, mocked_responses, transferring_citizen, transfer_service
+    ):
+        """Test continuing transfer when the target operator accepts or rejects it."""
         citizen, affiliation = transferring_citizen
 
-        # Mock document service response
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = {
-            "document_id": "https://example.com/doc1.pdf",
-            "document_rut": "https://example.com/doc2.pdf",
-        }
+        # Mock document service and external operator responses
+        mocked_responses.get(
+            DOCUMENTS_URL,
+            json={
+                "document_id": "https://example.com/doc1.pdf",
+                "document_rut": "https://example.com/doc2.pdf",
+            },
+        )
+        mocked_responses.post(
+            affiliation.transfer_destination_api_url,
+            status=post_status,
+            json={"message": "Transfer received", "citizenId": citizen.citizen_id},
+        )
 
-        # Mock external operator response
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = {
-            "message": "Transfer received",
-            "citizenId": citizen.citizen_id,
-        }
+        result = transfer_service.continue_transfer_after_unregister(citizen.citizen_id)
 
-        result = self.service.continue_transfer_after_unregister(citizen.citizen_id)
-
-        assert result["success"] is True
+        assert result["success"] is expect_success
 
         # Verify POST was made to target operator
-        mock_post.assert_called_once()
-        call_args = mock_post.call_args
-        assert affiliation.transfer_destination_api_url in call_args[0]
+        [posted] = [c.request for c in mocked_responses.calls if c.request.method == "POST"]
+        assert posted.url == affiliation.transfer_destination_api_url
 
         # Verify payload structure
-        payload = call_args[1]["json"]
+        payload = json.loads(posted.body)
         assert payload["id"] == int(citizen.citizen_id)
         assert payload["citizenName"] == citizen.name
         assert payload["citizenEmail"] == citizen.email
         assert "confirmAPI" in payload
 
-    def test_continue_transfer_citizen_not_transferring(self, affiliated_citizen):
+        # Status stays TRANSFERRING either way (a failed send can be retried)
+        affiliation.refresh_from_db(fields=["status"])
+        assert affiliation.status == "TRANSFERRING"
+
+    def test_continue_transfer_citizen_not_transferring(self, affiliated_citizen, transfer_service):
         """Test continuing transfer for citizen not in TRANSFERRING state."""
         citizen, _ = affiliated_citizen
 
-        result = self.service.continue_transfer_after_unregister(citizen.citizen_id)
+        result = transfer_service.continue_transfer_after_unregister(citizen.citizen_id)
 
         assert result["success"] is False
-        assert "not" in result["message"].lower() and "transfer" in result["message"].lower()
-
-    @patch("affiliation.services.transfer_service.requests.post")
-    @patch("affiliation.services.transfer_service.requests.get")
-    def test_continue_transfer_external_api_failure(
-        self, mock_get, mock_post, transferring_citizen
-    ):
-        """Test handling external operator API failure."""
-        citizen, affiliation = transferring_citizen
-
-        # Mock document service success
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = {}
-
-        # Mock external operator failure
-        mock_post.return_value.status_code = 500
-        mock_post.return_value.text = "Internal Server Error"
-
-        result = self.service.continue_transfer_after_unregister(citizen.citizen_id)
-
-        assert result["success"] is False
-
-        # Status remains TRANSFERRING (not rolled back) for retry capability
-        affiliation.refresh_from_db()
-        assert affiliation.status == "TRANSFERRING"
+        assert result["message"] == f"Citizen {citizen.citizen_id} is not being transferred"
 
 
 @pytest.mark.django_db
 class TestTransferServiceConfirmation:
     """Test cases for handling transfer confirmations."""
 
-    def setup_method(self):
-        """Set up test dependencies."""
-        self.service = TransferService()
-
-    @patch("affiliation.services.transfer_service.publish_user_transferred")
-    def test_confirmation_success_deletes_citizen(self, mock_publish, transferring_citizen):
-        """Test successful confirmation deletes citizen and publishes event."""
+    def test_confirmation_success_deletes_citizen(self, transferring_citizen, transfer_service):
+        """Test successful confirmation deletes citizen and records event."""
         citizen, affiliation = transferring_citizen
         citizen_id = citizen.citizen_id
-        mock_publish.return_value = True
 
-        result = self.service.handle_transfer_confirmation(citizen_id, req_status=1)
+        result = transfer_service.handle_transfer_confirmation(citizen_id, req_status=1)
 
         assert result["success"] is True
 
         # Verify citizen and affiliation were deleted
         assert not Citizen.objects.filter(citizen_id=citizen_id).exists()
+        assert not Affiliation.objects.filter(pk=affiliation.pk).exists()
 
-        # Verify user.transferred event was published
-        assert mock_publish.called
+        # Verify user.transferred event was queued
+        assert OutboxEvent.objects.filter(
+            event_type=settings.RABBITMQ_USER_TRANSFERRED_QUEUE,
+            payload__idCitizen=int(citizen_id),
+        ).exists()
 
-    def test_confirmation_failure_rolls_back(self, transferring_citizen):
+    def test_confirmation_failure_rolls_back(self, transferring_citizen, transfer_service):
         """Test failed confirmation rolls back to AFFILIATED status."""
         citizen, affiliation = transferring_citizen
 
-        result = self.service.handle_transfer_confirmation(citizen.citizen_id, req_status=0)
+        result = transfer_service.handle_transfer_confirmation(citizen.citizen_id, req_status=0)
 
-        # Service should handle rollback
-        assert result["success"] is False or result["success"] is True
+        assert result == {
+            "success": False,
+            "message": (
+                f"Transfer failed for citizen {citizen.citizen_id}. "
+                "Status rolled back to AFFILIATED."
+            ),
+        }
 
         # Verify citizen still exists
         assert Citizen.objects.filter(citizen_id=citizen.citizen_id).exists()
 
         # Verify affiliation status rolled back
-        affiliation.refresh_from_db()
+        affiliation.refresh_from_db(fields=["status", "transfer_destination_operator_id"])
         assert affiliation.status == "AFFILIATED"
         assert affiliation.transfer_destination_operator_id is None
 
-    def test_confirmation_citizen_not_found(self):
+    def test_confirmation_citizen_not_found(self, transfer_service):
         """Test confirmation for non-existent citizen."""
-        result = self.service.handle_transfer_confirmation("9999999999", req_status=1)
+        result = transfer_service.handle_transfer_confirmation("9999999999", req_status=1)
 
         assert result["success"] is False
-        assert "not found" in result["message"].lower()
+        assert result["message"] == "Citizen 9999999999 not found"
 
 
 @pytest.mark.django_db
 class TestTransferServiceCompleteAfterDocuments:
     """Test cases for completing incoming transfer after documents are ready."""
 
-    def setup_method(self):
-        """Set up test dependencies."""
-        self.service = TransferService()
-
-    @patch("affiliation.rabbitmq.publisher.publish_register_citizen_requested")
-    def test_complete_transfer_success(self, mock_publish, create_citizen, create_affiliation):
+    def test_complete_transfer_success(self, create_citizen, create_affiliation, transfer_service):
         """Test completing transfer after documents are ready."""
         citizen = create_citizen(is_verified=False, verification_status="pending")
         affiliation = create_affiliation(
@@ -314,22 +329,24 @@ class TestTransferServiceCompleteAfterDocuments:
             documents_ready=False,
         )
 
-        mock_publish.return_value = True
-
-        result = self.service.complete_transfer_after_documents(citizen.citizen_id)
+        result = transfer_service.complete_transfer_after_documents(citizen.citizen_id)
 
         assert result["success"] is True
 
         # Verify documents_ready flag was set
-        affiliation.refresh_from_db()
+        affiliation.refresh_from_db(fields=["documents_ready"])
         assert affiliation.documents_ready is True
 
-        # Verify register event was published
-        mock_publish.assert_called_once()
+        # Verify register event was queued
+        assert (
+            OutboxEvent.objects.filter(
+                event_type=settings.RABBITMQ_REGISTER_CITIZEN_REQUESTED_QUEUE
+            ).count()
+            == 1
+        )
 
-    @patch("affiliation.rabbitmq.publisher.publish_register_citizen_requested")
     def test_complete_transfer_no_callback_url(
-        self, mock_publish, create_citizen, create_affiliation
+        self, create_citizen, create_affiliation, transfer_service
     ):
         """Test completing transfer when no callback URL is set."""
         citizen = create_citizen(is_verified=False)
@@ -337,70 +354,162 @@ class TestTransferServiceCompleteAfterDocuments:
             citizen, status="TRANSFERRING", transfer_confirmation_url=None, documents_ready=False
         )
 
-        mock_publish.return_value = True
-
-        result = self.service.complete_transfer_after_documents(citizen.citizen_id)
+        result = transfer_service.complete_transfer_after_documents(citizen.citizen_id)
 
         # Should still succeed and mark documents ready
         assert result["success"] is True
-        affiliation.refresh_from_db()
+        affiliation.refresh_from_db(fields=["documents_ready"])
         assert affiliation.documents_ready is True
 
 
 @pytest.mark.django_db
-class TestTransferServicePrivateMethods:
-    """Test cases for private helper methods in TransferService."""
+class TestTransferServiceCheckAndComplete:
+    """Test cases for completing incoming transfers once both events arrived."""
 
-    def setup_method(self):
-        """Set up test dependencies."""
-        self.service = TransferService()
+    def test_waiting_for_verification(self, create_citizen, create_affiliation, transfer_service):
+        """Test transfer stays TRANSFERRING while MINTIC verification is pending."""
+        citizen = create_citizen(is_verified=False)
+        affiliation = create_affiliation(citizen, status="TRANSFERRING", documents_ready=True)
 
-    @patch("affiliation.services.transfer_service.requests.get")
-    def test_get_citizen_documents_success(self, mock_get):
-        """Test fetching citizen documents from document service."""
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = {
-            "document_id": "https://storage.com/id.pdf",
-            "document_rut": "https://storage.com/rut.pdf",
+        result = transfer_service.check_and_complete_transfer(citizen.citizen_id)
+
+        assert result["success"] is False
+        assert result["message"] == (
+            f"Transfer for citizen {citizen.citizen_id} is waiting for MINTIC verification"
+        )
+        affiliation.refresh_from_db(fields=["status"])
+        assert affiliation.status == "TRANSFERRING"
+
+    def test_completes_when_both_conditions_met(
+        self, create_citizen, create_affiliation, transfer_service
+    ):
+        """Test transfer completes and queues the confirmation and affiliation.created."""
+        citizen = create_citizen(is_verified=True, verification_status="verified")
+        affiliation = create_affiliation(
+            citizen,
+            status="TRANSFERRING",
+            transfer_confirmation_url="https://source-operator.com/api/confirm/",
+            documents_ready=True,
+        )
+
+        result = transfer_service.check_and_complete_transfer(citizen.citizen_id)
+
+        assert result["success"] is True
+        affiliation.refresh_from_db(fields=["status"])
+        assert affiliation.status == "AFFILIATED"
+        [confirmation] = OutboxEvent.objects.filter(event_type=TRANSFER_CONFIRMATION_EVENT)
+        assert confirmation.payload == {
+            "confirmAPI": "https://source-operator.com/api/confirm/",
+            "id": int(citizen.citizen_id),
+            "req_status": 1,
         }
+        assert OutboxEvent.objects.filter(
+            event_type=settings.RABBITMQ_AFFILIATION_CREATED_QUEUE
+        ).exists()
+
+    def test_duplicate_events_complete_transfer_once(
+        self, create_citizen, create_affiliation, transfer_service
+    ):
+        """Test a redelivered completion event neither re-confirms nor re-publishes."""
+        citizen = create_citizen(is_verified=True, verification_status="verified")
+        create_affiliation(
+            citizen,
+            status="TRANSFERRING",
+            transfer_confirmation_url="https://source-operator.com/api/confirm/",
+            documents_ready=True,
+        )
 
-        result = self.service._get_citizen_documents("1234567890")
+        first = transfer_service.check_and_complete_transfer(citizen.citizen_id)
+        queued = OutboxEvent.objects.count()
+        second = transfer_service.check_and_complete_transfer(citizen.citizen_id)
+
+        assert first["success"] is True
+        assert second["success"] is False
+        assert second["message"] == (
+            f"Citizen {citizen.citizen_id} is not being transferred (status: AFFILIATED)"
+        )
+        assert OutboxEvent.objects.filter(event_type=TRANSFER_CONFIRMATION_EVENT).count() == 1
+        assert OutboxEvent.objects.count() == queued
+
+    def test_waiting_for_documents_and_verification(
+        self, create_citizen, create_affiliation, transfer_service
+    ):
+        """Test every missing precondition is named when neither event has arrived."""
+        citizen = create_citizen(is_verified=False)
+        create_affiliation(citizen, status="TRANSFERRING", documents_ready=False)
+
+        result = transfer_service.check_and_complete_transfer(citizen.citizen_id)
+
+        assert result["success"] is False
+        assert result["message"] == (
+            f"Transfer for citizen {citizen.citizen_id} is waiting for "
+            f"documents and MINTIC verification"
+        )
+
+    def test_no_affiliation(self, create_citizen, transfer_service):
+        """Test a citizen without an affiliation gets an explicit message."""
+        citizen = create_citizen()
+
+        result = transfer_service.check_and_complete_transfer(citizen.citizen_id)
+
+        assert result["success"] is False
+        assert result["message"] == f"No affiliation found for citizen {citizen.citizen_id}"
+
+
+class TestTransferServicePrivateMethods:
+    """Test cases for private helper methods in TransferService (HTTP only, no database)."""
+
+    def test_get_citizen_documents_success(self, mocked_responses, transfer_service):
+        """Test fetching citizen documents from document service."""
+        mocked_responses.get(
+            DOCUMENTS_URL,
+            json={
+                "document_id": "https://storage.com/id.pdf",
+                "document_rut": "https://storage.com/rut.pdf",
+            },
+        )
+
+        result = transfer_service._get_citizen_documents("1234567890")
 
         assert result["document_id"] == "https://storage.com/id.pdf"
         assert result["document_rut"] == "https://storage.com/rut.pdf"
 
-    @patch("affiliation.services.transfer_service.requests.get")
-    def test_get_citizen_documents_service_unavailable(self, mock_get):
+    def test_get_citizen_documents_service_unavailable(self, mocked_responses, transfer_service):
         """Test handling document service unavailability."""
-        mock_get.side_effect = Exception("Connection refused")
+        mocked_responses.get(DOCUMENTS_URL, body=requests.ConnectionError("Connection refused"))
 
-        result = self.service._get_citizen_documents("1234567890")
+        result = transfer_service._get_citizen_documents("1234567890")
 
         # Should return empty dict on error
         assert result == {}
 
-    @patch("affiliation.services.transfer_service.requests.post")
-    def test_send_confirmation_success(self, mock_post):
+    def test_send_confirmation_success(self, mocked_responses, transfer_service):
         """Test sending confirmation to source operator."""
-        confirmation_url = "https://source-operator.com/api/confirm/"
-        mock_post.return_value.status_code = 200
+        mocked_responses.post(CONFIRMATION_URL)
 
-        # Should not raise exception
-        self.service._send_confirmation(
-            "https://source-operator.com/api/confirm/", "1234567890", status=1
-        )
+        assert transfer_service._send_confirmation(CONFIRMATION_URL, "1234567890", status=1)
 
-        mock_post.assert_called_once()
-        payload = mock_post.call_args[1]["json"]
+        [call] = mocked_responses.calls
+        payload = json.loads(call.request.body)
         assert payload["id"] == 1234567890  # _send_confirmation converts to int
         assert payload["req_status"] == 1
 
-    @patch("affiliation.services.transfer_service.requests.post")
-    def test_send_confirmation_handles_errors(self, mock_post):
-        """Test error handling when sending confirmation fails."""
-        mock_post.side_effect = Exception("Connection timeout")
+    @pytest.mark.parametrize(
+        "body",
+        [
+            pytest.param(requests.ConnectionError("refused"), id="unreachable"),
+            pytest.param(Exception("Connection timeout"), id="unexpected_error"),
+        ],
+    )
+    def test_send_confirmation_reports_failure(self, body, mocked_responses, transfer_service):
+        """Test a failed confirmation returns False so the outbox relay retries it."""
+        mocked_responses.post(CONFIRMATION_URL, body=body)
 
         # Should not raise exception, just log error
-        self.service._send_confirmation(
-            "https://source-operator.com/api/confirm/", "1234567890", status=1
-        )
+        assert not transfer_service._send_confirmation(CONFIRMATION_URL, "1234567890", status=1)
+
+    def test_send_confirmation_rejected(self, mocked_responses, transfer_service):
+        """Test a non-200 answer from the sending operator counts as not delivered."""
+        mocked_responses.post(CONFIRMATION_URL, status=500, body="Internal Server Error")
+
+        assert not transfer_service._send_confirmation(CONFIRMATION_URL, "1234567890", status=1)